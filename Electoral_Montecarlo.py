@@ -11,11 +11,21 @@ run in constrained environments.
 
 from __future__ import annotations
 
+import csv
+import hashlib
+import io
 import math
+import os
 import random
+import threading
+from bisect import bisect_left
 from dataclasses import dataclass, field
+from itertools import accumulate
 from pathlib import Path
-from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Number of draws folded into the streaming covariance at once.
+_COVARIANCE_BATCH = 256
 
 
 @dataclass
@@ -29,8 +39,9 @@ class ElectionData:
     majoritarian_coefficient: float = 0.37
     seats: int = 630
     majoritarian_shares: Optional[List[float]] = None
+    regions: Optional["RegionalTable"] = None
 
-    def __post_init__(self) -> None:  # pragma: no cover - simple coercion
+    def __post_init__(self) -> None:
         self.parties = list(self.parties)
         self.proportional_shares = [float(value) for value in self.proportional_shares]
         self.proportional_coefficient = float(self.proportional_coefficient)
@@ -38,6 +49,8 @@ class ElectionData:
         self.seats = int(self.seats)
         if self.majoritarian_shares is not None:
             self.majoritarian_shares = [float(value) for value in self.majoritarian_shares]
+        if self.regions is not None:
+            self.regions = self.regions.reordered(self.parties)
         self._validate()
 
     # ------------------------------------------------------------------
@@ -75,6 +88,459 @@ class ElectionData:
         if self.seats <= 0:
             raise ValueError("The total number of seats must be strictly positive")
 
+        if self.regions is not None:
+            proportional_total = int(round(self.seats * self.proportional_coefficient))
+            if tuple(self.regions.parties) != tuple(self.parties):
+                raise ValueError("The regional table must list exactly the parties of the election")
+            if self.regions.total_seats != proportional_total:
+                raise ValueError(
+                    f"The regional seats sum to {self.regions.total_seats} but the "
+                    f"proportional tier has {proportional_total} seats"
+                )
+
+
+def largest_remainder(shares: Sequence[float], total: int) -> List[int]:
+    """Apportion ``total`` seats with the largest-remainder (Hare) method.
+
+    Ties on the fractional parts favour the larger share, then the earlier
+    party.  Seats are left unassigned only when the shares sum to less than one.
+    """
+
+    return largest_remainder_batch([shares], [total])[0]
+
+
+def largest_remainder_batch(
+    share_rows: Sequence[Sequence[float]],
+    totals: Sequence[int],
+) -> List[List[int]]:
+    """Apportion every row of ``share_rows`` its own total in a single pass.
+
+    Each row is allocated exactly as :func:`largest_remainder` would; quotas,
+    floors and remainders of all rows are computed together so that callers
+    with many constituencies (or many sampled share matrices) pay one call.
+    """
+
+    if len(share_rows) != len(totals):
+        raise ValueError("Each row of shares must have a corresponding seat total")
+
+    quotas = [[share * total for share in row] for row, total in zip(share_rows, totals)]
+    floors = [[int(math.floor(quota)) for quota in row] for row in quotas]
+    allocations = []
+    for shares, row_quotas, base, total in zip(share_rows, quotas, floors, totals):
+        remainder = total - sum(base)
+        if remainder > 0:
+            order = sorted(
+                range(len(shares)),
+                key=lambda index: (-(row_quotas[index] - base[index]), -shares[index], index),
+            )
+            for index in order[:remainder]:
+                base[index] += 1
+        allocations.append(base)
+    return allocations
+
+
+@dataclass(frozen=True)
+class RegionalTable:
+    """Proportional tier apportioned across regional constituencies.
+
+    ``shares[r][p]`` is the vote share of party ``p`` in region ``r`` and
+    ``seats[r]`` the proportional seats assigned to that region.
+    """
+
+    regions: Tuple[str, ...]
+    parties: Tuple[str, ...]
+    seats: Tuple[int, ...]
+    shares: Tuple[Tuple[float, ...], ...]
+
+    def __post_init__(self) -> None:
+        if not self.regions:
+            raise ValueError("The regional table must contain at least one region")
+        if len(set(self.regions)) != len(self.regions):
+            raise ValueError("Each region must have a unique name")
+        if len(set(self.parties)) != len(self.parties):
+            raise ValueError("Each party column of the regional table must be unique")
+        if len(self.seats) != len(self.regions) or len(self.shares) != len(self.regions):
+            raise ValueError("Each region must have a seat count and a row of shares")
+        if any(len(row) != len(self.parties) for row in self.shares):
+            raise ValueError("Each region must provide a share for every party")
+        if any(seats < 0 for seats in self.seats):
+            raise ValueError("Regional seat counts cannot be negative")
+        for region, row in zip(self.regions, self.shares):
+            if any(share < 0.0 for share in row):
+                raise ValueError(f"Vote shares of region {region!r} cannot contain negative values")
+            if sum(row) > 1.0 + 1e-9:
+                raise ValueError(f"The vote shares of region {region!r} exceed one")
+
+    @classmethod
+    def from_csv(cls, filename: str) -> "RegionalTable":
+        """Read a ``region,seats,<party>,...`` CSV file with fractional shares."""
+
+        return cls.parse(Path(filename).read_text(encoding="utf-8"))
+
+    @classmethod
+    def parse(cls, text: str) -> "RegionalTable":
+        """Parse CSV text in the format described in :meth:`from_csv`."""
+
+        rows = [
+            [cell.strip() for cell in row]
+            for row in csv.reader(io.StringIO(text))
+            if any(cell.strip() for cell in row)
+        ]
+        if len(rows) < 2 or len(rows[0]) < 3:
+            raise ValueError("The regional table needs a header with region, seats and parties")
+
+        header, body = rows[0], rows[1:]
+        if any(len(row) != len(header) for row in body):
+            raise ValueError("Every regional row must have as many columns as the header")
+        return cls(
+            regions=tuple(row[0] for row in body),
+            parties=tuple(header[2:]),
+            seats=tuple(int(float(row[1])) for row in body),
+            shares=tuple(tuple(float(value) for value in row[2:]) for row in body),
+        )
+
+    @property
+    def total_seats(self) -> int:
+        return sum(self.seats)
+
+    def reordered(self, parties: Sequence[str]) -> "RegionalTable":
+        """Return the table with its columns in the order of ``parties``."""
+
+        if set(parties) != set(self.parties) or len(parties) != len(self.parties):
+            raise ValueError("The regional table must list exactly the parties of the election")
+        if tuple(parties) == self.parties:
+            return self
+        columns = [self.parties.index(party) for party in parties]
+        return RegionalTable(
+            regions=self.regions,
+            parties=tuple(parties),
+            seats=self.seats,
+            shares=tuple(tuple(row[column] for column in columns) for row in self.shares),
+        )
+
+    def allocate_regions(
+        self,
+        shares: Optional[Sequence[Sequence[float]]] = None,
+    ) -> List[List[int]]:
+        """Seats of every party in every region (optionally for other shares)."""
+
+        return largest_remainder_batch(self.shares if shares is None else shares, self.seats)
+
+    def allocate(self, shares: Optional[Sequence[Sequence[float]]] = None) -> List[int]:
+        """National proportional seat vector: the regional allocations summed."""
+
+        return [sum(column) for column in zip(*self.allocate_regions(shares))]
+
+
+class SeatCovariance:
+    """Streaming mean and covariance of the simulated seat vectors.
+
+    Draws are folded in batch by batch using the pairwise update of Chan et al.,
+    so memory stays ``O(K**2)`` for ``K`` parties regardless of the number of
+    iterations and no draw history needs to be retained.
+    """
+
+    def __init__(self, parties: Sequence[str]) -> None:
+        self.parties = list(parties)
+        size = len(self.parties)
+        self.count = 0
+        self.mean = [0.0] * size
+        self._comoment = [[0.0] * size for _ in range(size)]
+
+    def update(self, draws: Sequence[Sequence[int]]) -> None:
+        """Merge a batch of seat vectors into the running statistics."""
+
+        batch = len(draws)
+        if batch == 0:
+            return
+
+        size = len(self.parties)
+        batch_mean = [sum(draw[index] for draw in draws) / batch for index in range(size)]
+        centred = [[draw[index] - batch_mean[index] for index in range(size)] for draw in draws]
+        batch_comoment = [[0.0] * size for _ in range(size)]
+        for row in centred:
+            for i in range(size):
+                value = row[i]
+                if value == 0.0:
+                    continue
+                target = batch_comoment[i]
+                for j in range(i, size):
+                    target[j] += value * row[j]
+
+        total = self.count + batch
+        delta = [batch_mean[index] - self.mean[index] for index in range(size)]
+        scale = self.count * batch / total
+        for i in range(size):
+            for j in range(i, size):
+                merged = self._comoment[i][j] + batch_comoment[i][j] + delta[i] * delta[j] * scale
+                self._comoment[i][j] = merged
+                self._comoment[j][i] = merged
+            self.mean[i] += delta[i] * batch / total
+        self.count = total
+
+    def covariance(self) -> Dict[str, Dict[str, float]]:
+        """Return the sample covariance matrix keyed by party name."""
+
+        denominator = self.count - 1
+        return {
+            first: {
+                second: (self._comoment[i][j] / denominator if denominator > 0 else 0.0)
+                for j, second in enumerate(self.parties)
+            }
+            for i, first in enumerate(self.parties)
+        }
+
+    def correlation(self) -> Dict[str, Dict[str, float]]:
+        """Return the Pearson correlation matrix keyed by party name.
+
+        Pairs involving a party whose seat count never varies are undefined and
+        reported as ``0.0`` (``1.0`` on the diagonal).
+        """
+
+        deviations = [math.sqrt(max(self._comoment[i][i], 0.0)) for i in range(len(self.parties))]
+        matrix: Dict[str, Dict[str, float]] = {}
+        for i, first in enumerate(self.parties):
+            row: Dict[str, float] = {}
+            for j, second in enumerate(self.parties):
+                if i == j:
+                    row[second] = 1.0
+                elif deviations[i] > 0.0 and deviations[j] > 0.0:
+                    row[second] = self._comoment[i][j] / (deviations[i] * deviations[j])
+                else:
+                    row[second] = 0.0
+            matrix[first] = row
+        return matrix
+
+
+@dataclass(frozen=True)
+class CompiledScenario:
+    """Immutable, hashable form of an :class:`ElectionData` ready to simulate.
+
+    Everything that does not depend on the random draws is resolved once: the
+    proportional tier is allocated (nationally or region by region, since the
+    shares are fixed) and the majoritarian weights are turned into
+    a cumulative table searched by bisection.  Instances can be cached and
+    shared freely between threads.
+    """
+
+    name: str
+    parties: Tuple[str, ...]
+    proportional_seats: Tuple[int, ...]
+    majoritarian_seats: int
+    cumulative_weights: Tuple[float, ...]
+
+    @property
+    def weight_total(self) -> float:
+        return self.cumulative_weights[-1]
+
+
+@dataclass
+class SimulationResult:
+    """Outcome of :func:`run_scenario`; nothing in it is shared with the scenario."""
+
+    parties: Tuple[str, ...]
+    iterations: int
+    totals: List[int]
+    distributions: Optional[Dict[str, Dict[int, int]]] = None
+    covariance: Optional[SeatCovariance] = None
+    history: Optional[Dict[str, List[int]]] = None
+
+    @property
+    def expected(self) -> Dict[str, int]:
+        """Expected seats rounded to the nearest integer."""
+
+        return {
+            party: int(round(total / self.iterations))
+            for party, total in zip(self.parties, self.totals)
+        }
+
+
+def compile_scenario(data: ElectionData) -> CompiledScenario:
+    """Validate ``data`` and precompute its draw-independent parts."""
+
+    data.validate()
+    weights = data.majoritarian_shares if data.majoritarian_shares else data.proportional_shares
+    cumulative = tuple(accumulate(weights))
+    majoritarian_total = int(round(data.seats * data.majoritarian_coefficient))
+    if majoritarian_total > 0 and cumulative[-1] <= 0.0:
+        raise ValueError("Weights must sum to a positive value")
+
+    if data.regions is not None:
+        proportional = data.regions.allocate()
+    else:
+        proportional_total = int(round(data.seats * data.proportional_coefficient))
+        proportional = largest_remainder(data.proportional_shares, proportional_total)
+    return CompiledScenario(
+        name=data.name,
+        parties=tuple(data.parties),
+        proportional_seats=tuple(proportional),
+        majoritarian_seats=majoritarian_total,
+        cumulative_weights=cumulative,
+    )
+
+
+def draw_seats(scenario: CompiledScenario, rng: random.Random) -> List[int]:
+    """Draw one seat vector: fixed proportional tier plus majoritarian draws."""
+
+    seats = list(scenario.proportional_seats)
+    cumulative = scenario.cumulative_weights
+    total = cumulative[-1]
+    last = len(seats) - 1
+    draw = rng.random
+    for _ in range(scenario.majoritarian_seats):
+        # First index whose cumulative weight reaches the threshold; the guard
+        # protects against rounding at the upper end.
+        winner = bisect_left(cumulative, draw() * total)
+        seats[winner if winner <= last else last] += 1
+    return seats
+
+
+def run_scenario(
+    scenario: CompiledScenario,
+    iterations: int,
+    rng: random.Random,
+    keep_history: bool = False,
+    covariance: bool = False,
+    distributions: bool = False,
+) -> SimulationResult:
+    """Simulate ``iterations`` draws of ``scenario`` using only ``rng``.
+
+    Only the seat totals are always accumulated; ``covariance`` and
+    ``distributions`` enable the ``O(K**2)`` seat covariance and the per-party
+    histograms, and ``keep_history`` keeps every draw.  The function has no
+    side effects besides advancing ``rng``, so concurrent calls are safe as long
+    as each thread uses its own generator (see :class:`RngStreams`).
+    """
+
+    if iterations <= 0:
+        raise ValueError("The number of iterations must be strictly positive")
+
+    size = len(scenario.parties)
+    totals = [0] * size
+    history: List[List[int]] = [[] for _ in range(size)]
+    counts: List[Dict[int, int]] = [{} for _ in range(size)]
+    accumulator = SeatCovariance(scenario.parties) if covariance else None
+    batch: List[List[int]] = []
+
+    for _ in range(iterations):
+        draw = draw_seats(scenario, rng)
+        for index, value in enumerate(draw):
+            totals[index] += value
+            if distributions:
+                counts[index][value] = counts[index].get(value, 0) + 1
+            if keep_history:
+                history[index].append(value)
+        if accumulator is not None:
+            batch.append(draw)
+            if len(batch) == _COVARIANCE_BATCH:
+                accumulator.update(batch)
+                batch = []
+    if accumulator is not None:
+        accumulator.update(batch)
+
+    return SimulationResult(
+        parties=scenario.parties,
+        iterations=iterations,
+        totals=totals,
+        distributions={
+            party: dict(sorted(counts[index].items()))
+            for index, party in enumerate(scenario.parties)
+        } if distributions else None,
+        covariance=accumulator,
+        history={
+            party: history[index]
+            for index, party in enumerate(scenario.parties)
+        } if keep_history else None,
+    )
+
+
+# Fork lineage of the current process: "" where this module was imported, then
+# "1", "2", ... in the processes it forks, "1.1" in a grandchild, and so on.
+_process_lineage = ""
+_fork_count = 0
+
+
+def _before_fork() -> None:
+    global _fork_count
+    _fork_count += 1
+
+
+def _after_fork_in_child() -> None:
+    global _process_lineage, _fork_count
+    _process_lineage = f"{_process_lineage}.{_fork_count}" if _process_lineage else str(_fork_count)
+    _fork_count = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
+
+
+class RngStreams:
+    """Independent :class:`random.Random` streams derived from one root seed.
+
+    Stream ``i`` is seeded with a SHA-256 digest of ``(root_seed, worker,
+    lineage, i)``, so streams do not overlap in practice and a given root seed
+    always yields the same streams.  :meth:`local` hands every thread its own
+    stream, which lets concurrent simulations run without locking.
+
+    Processes never share streams: without an explicit root seed each process
+    draws a fresh one, and with one the digest also mixes the fork lineage of
+    the process (for workers forked after this module was imported) and the
+    ``worker`` identifier (for workers that import it themselves, e.g. the
+    ordinal of a Gunicorn worker).  The main process with no ``worker`` keeps
+    the plain ``(root_seed, i)`` streams.
+    """
+
+    def __init__(self, root_seed: Optional[int] = None, worker: Optional[str] = None) -> None:
+        self.worker = worker
+        self._explicit_seed = root_seed
+        self._root_seed: Optional[int] = root_seed
+        self._pid = os.getpid()
+        self._next_index = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def root_seed(self) -> int:
+        with self._lock:
+            return self._current_root()
+
+    def stream(self, index: int) -> random.Random:
+        """Return a new generator positioned at the start of stream ``index``."""
+
+        key = str(self.root_seed)
+        if self.worker:
+            key += f":worker={self.worker}"
+        if _process_lineage:
+            key += f":fork={_process_lineage}"
+        key += f":{index}"
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest, "big"))
+
+    def local(self) -> random.Random:
+        """Return the calling thread's generator, creating it on first use."""
+
+        generator = getattr(self._local, "generator", None)
+        if generator is None or self._local.pid != os.getpid():
+            with self._lock:
+                self._current_root()
+                index = self._next_index
+                self._next_index += 1
+            generator = self.stream(index)
+            self._local.generator = generator
+            self._local.pid = os.getpid()
+        return generator
+
+    def _current_root(self) -> int:
+        # Callers must hold ``self._lock``.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._root_seed = self._explicit_seed
+            self._next_index = 0
+        if self._root_seed is None:
+            self._root_seed = random.SystemRandom().getrandbits(64)
+        return self._root_seed
+
 
 class MontecarloElectoral:
     """High level façade for simulating elections.
@@ -104,6 +570,8 @@ class MontecarloElectoral:
         )
         self.results: Dict[str, float] = {"Party": 1.0}
         self.allResults: Dict[str, List[int]] = {}
+        self.distributions: Dict[str, Dict[int, int]] = {}
+        self.covariance: Optional[SeatCovariance] = None
         self._rng: random.Random = rng or random.Random()
 
     # ------------------------------------------------------------------
@@ -136,6 +604,27 @@ class MontecarloElectoral:
             seats=seats,
         )
 
+    def import_regions_csv(self, filename: str) -> None:
+        """Apportion the proportional tier across the regions of a CSV table.
+
+        The file has a ``region,seats,<party>,...`` header followed by one row
+        per constituency with its proportional seats and fractional vote shares.
+        The regional seats must add up to the proportional tier of the election
+        already loaded.
+        """
+
+        self._ensure_loaded()
+        self._set_data(
+            name=self.data.name,
+            parties=self.data.parties,
+            proportional_shares=self.data.proportional_shares,
+            proportional_coefficient=self.data.proportional_coefficient,
+            majoritarian_coefficient=self.data.majoritarian_coefficient,
+            seats=self.data.seats,
+            majoritarian_shares=self.data.majoritarian_shares,
+            regions=RegionalTable.from_csv(filename),
+        )
+
     def import_as_txt(self, filename: str = "Elections/Election.txt") -> None:
         """Populate the internal state by parsing a tab separated text file."""
 
@@ -185,7 +674,7 @@ class MontecarloElectoral:
 
         self._ensure_loaded()
         generator = self._resolve_rng(seed=seed, rng=rng)
-        seat_vector = self._simulate_single_draw(generator)
+        seat_vector = draw_seats(self.compile(), generator)
         return {
             party: seat_vector[index]
             for index, party in enumerate(self.data.parties)
@@ -195,34 +684,40 @@ class MontecarloElectoral:
         self,
         iterations: int = 1_000,
         seed: Optional[int] = None,
+        keep_history: bool = True,
     ) -> Dict[str, int]:
-        """Compute the expected seat distribution by averaging many draws."""
+        """Compute the expected seat distribution by averaging many draws.
+
+        The seat covariance across parties is accumulated on the fly and stored
+        in :attr:`covariance`, while :attr:`distributions` counts how often each
+        party obtained each seat total.  Passing ``keep_history=False`` skips
+        filling :attr:`allResults`, keeping memory independent of ``iterations``.
+        """
 
         if iterations <= 0:
             raise ValueError("The number of iterations must be strictly positive")
 
         self._ensure_loaded()
         generator = self._resolve_rng(seed=seed)
+        result = run_scenario(
+            self.compile(),
+            iterations,
+            generator,
+            keep_history=keep_history,
+            covariance=True,
+            distributions=True,
+        )
 
-        totals = [0] * len(self.data.parties)
-        history = [[] for _ in self.data.parties]
+        self.covariance = result.covariance
+        self.distributions = result.distributions
+        self.allResults = result.history or {}
+        return result.expected
 
-        for _ in range(iterations):
-            draw = self._simulate_single_draw(generator)
-            for index, value in enumerate(draw):
-                totals[index] += value
-                history[index].append(value)
+    def compile(self) -> CompiledScenario:
+        """Return the immutable :class:`CompiledScenario` of the loaded data."""
 
-        self.allResults = {
-            party: list(history[index])
-            for index, party in enumerate(self.data.parties)
-        }
-
-        averaged = [int(round(total / iterations)) for total in totals]
-        return {
-            party: averaged[index]
-            for index, party in enumerate(self.data.parties)
-        }
+        self._ensure_loaded()
+        return compile_scenario(self.data)
 
     def graphic(
         self,
@@ -307,6 +802,7 @@ class MontecarloElectoral:
         majoritarian_coefficient: float,
         seats: int,
         majoritarian_shares: Optional[Iterable[float]] = None,
+        regions: Optional[RegionalTable] = None,
     ) -> None:
         self.data = ElectionData(
             name=name,
@@ -316,6 +812,7 @@ class MontecarloElectoral:
             majoritarian_coefficient=majoritarian_coefficient,
             seats=seats,
             majoritarian_shares=list(majoritarian_shares) if majoritarian_shares else None,
+            regions=regions,
         )
         self.results = dict(zip(self.data.parties, self.data.proportional_shares))
 
@@ -335,60 +832,13 @@ class MontecarloElectoral:
             return rng
         return self._rng
 
-    def _simulate_single_draw(self, rng: random.Random) -> List[int]:
-        proportional = self._allocate_proportional_seats()
-        majoritarian = self._allocate_majoritarian_seats(rng)
-        return [p + m for p, m in zip(proportional, majoritarian)]
-
     def _allocate_proportional_seats(self) -> List[int]:
-        proportional_total = int(round(self.data.seats * self.data.proportional_coefficient))
-        raw_quotas = [share * proportional_total for share in self.data.proportional_shares]
-
-        base = [int(math.floor(quota)) for quota in raw_quotas]
-        assigned = sum(base)
-        remainder = proportional_total - assigned
-
-        if remainder > 0:
-            fractional = [quota - floor for quota, floor in zip(raw_quotas, base)]
-            order = sorted(
-                range(len(self.data.parties)),
-                key=lambda index: (
-                    -fractional[index],
-                    -self.data.proportional_shares[index],
-                    index,
-                ),
-            )
-            for index in order[:remainder]:
-                base[index] += 1
-
-        return base
+        return list(self.compile().proportional_seats)
 
     def _allocate_majoritarian_seats(self, rng: random.Random) -> List[int]:
-        majoritarian_total = int(round(self.data.seats * self.data.majoritarian_coefficient))
-        if majoritarian_total <= 0:
-            return [0] * len(self.data.parties)
-
-        # Use majoritarian_shares if provided, otherwise fall back to proportional_shares
-        weights = self.data.majoritarian_shares if self.data.majoritarian_shares else self.data.proportional_shares
-
-        result = [0] * len(self.data.parties)
-        for _ in range(majoritarian_total):
-            winner = self._weighted_choice(rng, weights)
-            result[winner] += 1
-        return result
-
-    def _weighted_choice(self, rng: random.Random, weights: Sequence[float]) -> int:
-        total = sum(weights)
-        if total <= 0.0:
-            raise ValueError("Weights must sum to a positive value")
-
-        threshold = rng.random() * total
-        cumulative = 0.0
-        for index, weight in enumerate(weights):
-            cumulative += weight
-            if threshold <= cumulative:
-                return index
-        return len(weights) - 1  # pragma: no cover - guard against rounding issues
+        scenario = self.compile()
+        seats = draw_seats(scenario, rng)
+        return [total - fixed for total, fixed in zip(seats, scenario.proportional_seats)]
 
     def _load_real_results(self, path: Path) -> Dict[str, float]:
         if not path.exists():
@@ -403,4 +853,16 @@ class MontecarloElectoral:
         return dict(zip(parties, seats))
 
 
-__all__ = ["MontecarloElectoral"]
+__all__ = [
+    "CompiledScenario",
+    "MontecarloElectoral",
+    "RegionalTable",
+    "RngStreams",
+    "SeatCovariance",
+    "SimulationResult",
+    "compile_scenario",
+    "draw_seats",
+    "largest_remainder",
+    "largest_remainder_batch",
+    "run_scenario",
+]
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""Cost-based admission control for the simulation endpoints.
+
+The work done by :meth:`MontecarloElectoral.complete_simulation` grows with the
+number of iterations times the per-iteration work: one bisection per
+majoritarian seat plus the per-entity bookkeeping and, when it is requested, the
+``O(K**2)`` covariance update.  :class:`CostModel` turns that into an estimated wall-clock time using a
+throughput measured on the running machine, and :class:`AdmissionController`
+uses the estimate to
+
+* reject (or downgrade) requests whose cost exceeds a per-request budget;
+* cap the number of simulations a single client may run concurrently;
+* bound the total estimated compute in flight on the server.
+
+The concurrency limits only mean something when they are shared by every
+worker (a sync Gunicorn worker serves one request at a time), so the counters
+live in a small JSON state file guarded by an ``fcntl`` lock, with one record
+per process.  Records of processes that no longer exist are discarded.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import platform
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from Electoral_Montecarlo import ElectionData, compile_scenario, run_scenario
+
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+
+class AdmissionError(Exception):
+    """Raised when a request cannot be admitted.
+
+    ``status`` is the HTTP status to answer with and ``details`` extra fields
+    for the JSON error body (e.g. the largest admissible iteration count).
+    """
+
+    def __init__(
+        self,
+        status: int,
+        message: str,
+        retry_after: Optional[int] = None,
+        **details: Any,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.details = details
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """Cost model ``iterations × (majoritarian seats + K [+ K² / 4])``.
+
+    ``K`` is the number of entities: the ``K`` term covers the per-entity
+    bookkeeping of every iteration and ``K² / 4`` the covariance update, which
+    is only charged when ``covariance`` is requested.  ``units_per_second`` is
+    the measured throughput in cost units.
+    """
+
+    units_per_second: float
+
+    @staticmethod
+    def units(iterations: int, majoritarian_seats: int, entities: int, covariance: bool = False) -> float:
+        entities = max(entities, 1)
+        per_iteration = max(majoritarian_seats, 0) + entities
+        if covariance:
+            per_iteration += entities * entities / 4.0
+        return float(iterations) * per_iteration
+
+    def seconds(
+        self, iterations: int, majoritarian_seats: int, entities: int, covariance: bool = False
+    ) -> float:
+        return self.units(iterations, majoritarian_seats, entities, covariance) / self.units_per_second
+
+    def max_iterations(
+        self, budget: float, majoritarian_seats: int, entities: int, covariance: bool = False
+    ) -> int:
+        """Largest iteration count whose estimated time fits within ``budget``."""
+
+        per_iteration = self.units(1, majoritarian_seats, entities, covariance) / self.units_per_second
+        return int(budget / per_iteration)
+
+
+def calibrate(
+    iterations: int = 200,
+    seats: int = 400,
+    entities: int = 8,
+    repeats: int = 3,
+) -> CostModel:
+    """Measure the simulator throughput on a reference scenario.
+
+    The scenario is run through :func:`run_scenario` without any optional
+    accumulator, as ``/api/simulate`` serves it by default.  The fastest of
+    ``repeats`` runs is kept to filter out scheduling noise.
+    """
+
+    scenario = compile_scenario(
+        ElectionData(
+            name="calibration",
+            parties=[f"P{index}" for index in range(entities)],
+            proportional_shares=[1.0 / entities] * entities,
+            proportional_coefficient=0.5,
+            majoritarian_coefficient=0.5,
+            seats=seats,
+        )
+    )
+
+    best = float("inf")
+    for _ in range(repeats):
+        rng = random.Random(0)
+        start = time.perf_counter()
+        run_scenario(scenario, iterations, rng)
+        best = min(best, time.perf_counter() - start)
+
+    units = CostModel.units(iterations, scenario.majoritarian_seats, entities)
+    return CostModel(units_per_second=units / max(best, 1e-9))
+
+
+def shared_cost_model(path: str, max_age: float = 86_400.0) -> CostModel:
+    """Calibrate once per host and share the measurement through ``path``.
+
+    Workers starting together serialise on a lock file: the first one
+    calibrates while the others wait (without competing for the CPU) and then
+    reuse its result.  Measurements older than ``max_age`` seconds, or taken on
+    another host, are redone.
+    """
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a", encoding="utf-8") as handle, _flock(handle):
+        try:
+            with open(path, encoding="utf-8") as stream:
+                record = json.load(stream)
+            if record["host"] == platform.node() and time.time() - float(record["calibrated"]) < max_age:
+                return CostModel(units_per_second=float(record["units_per_second"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        model = calibrate()
+        record = {"host": platform.node(), "calibrated": time.time(), "units_per_second": model.units_per_second}
+        try:
+            with open(path, "w", encoding="utf-8") as stream:
+                json.dump(record, stream)
+        except OSError:  # pragma: no cover - a read-only tree only loses the cache
+            pass
+        return model
+
+
+class AdmissionController:
+    """Per-request budgets plus per-client and per-worker concurrency limits.
+
+    Parameters
+    ----------
+    cost_model:
+        Model used to estimate the duration of a simulation.
+    max_request_seconds:
+        Largest estimated duration accepted for a single request.
+    max_worker_seconds:
+        Upper bound on the estimated compute simultaneously in flight across
+        the processes sharing ``state_path``.  A request is always admitted
+        when nothing else is running.
+    max_per_client:
+        Number of concurrent simulations allowed for one client.
+    min_iterations:
+        Smallest iteration count a request may be downgraded to.
+    state_path:
+        JSON file holding the counters shared by the worker processes.  Without
+        it the limits only apply to the threads of the current process.
+    """
+
+    def __init__(
+        self,
+        cost_model: CostModel,
+        max_request_seconds: float = 10.0,
+        max_worker_seconds: float = 20.0,
+        max_per_client: int = 2,
+        min_iterations: int = 100,
+        state_path: Optional[str] = None,
+    ) -> None:
+        self.cost_model = cost_model
+        self.max_request_seconds = max_request_seconds
+        self.max_worker_seconds = max_worker_seconds
+        self.max_per_client = max_per_client
+        self.min_iterations = min_iterations
+        self.state_path = state_path
+        if state_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._local: Dict[str, Dict[str, Any]] = {}
+
+    def plan(
+        self,
+        iterations: int,
+        majoritarian_seats: int,
+        entities: int,
+        allow_downgrade: bool = False,
+        covariance: bool = False,
+    ) -> Tuple[int, float]:
+        """Return the iteration count to run and its estimated duration.
+
+        Over-budget requests are downgraded to the largest admissible iteration
+        count when ``allow_downgrade`` is set, and rejected otherwise.
+        ``covariance`` charges the seat covariance accumulator.
+        """
+
+        return self.plan_units(
+            iterations,
+            CostModel.units(1, majoritarian_seats, entities, covariance),
+            allow_downgrade=allow_downgrade,
+        )
+
+    def plan_units(
+        self,
+        iterations: int,
+        iteration_units: float,
+        fixed_units: float = 0.0,
+        allow_downgrade: bool = False,
+    ) -> Tuple[int, float]:
+        """:meth:`plan` for work given directly in cost units.
+
+        ``iteration_units`` is the cost of one iteration and ``fixed_units``
+        the cost that does not depend on the number of iterations.
+        """
+
+        rate = self.cost_model.units_per_second
+        estimate = (iterations * iteration_units + fixed_units) / rate
+        if estimate <= self.max_request_seconds:
+            return iterations, estimate
+
+        max_iterations = max(0, int((self.max_request_seconds * rate - fixed_units) / iteration_units))
+        if allow_downgrade and max_iterations >= self.min_iterations:
+            return max_iterations, (max_iterations * iteration_units + fixed_units) / rate
+
+        if max_iterations >= self.min_iterations:
+            suggestion = (
+                f"Reduce iterations to at most {max_iterations} or set 'allowDowngrade' "
+                "to run the largest admissible number of iterations"
+            )
+        else:
+            suggestion = "Reduce the number of majoritarian seats, parties or grid points"
+        raise AdmissionError(
+            422,
+            f"The requested simulation would take about {estimate:.1f}s, above the "
+            f"{self.max_request_seconds:g}s limit. {suggestion}.",
+            estimatedSeconds=round(estimate, 3),
+            maxSeconds=self.max_request_seconds,
+            maxIterations=max_iterations,
+        )
+
+    @contextmanager
+    def admit(self, client: str, seconds: float) -> Iterator[None]:
+        """Hold a slot for ``client`` while the body of the ``with`` block runs."""
+
+        with self._state() as state:
+            running = sum(record["clients"].get(client, 0) for record in state.values())
+            if running >= self.max_per_client:
+                raise AdmissionError(
+                    429,
+                    f"Too many concurrent simulations (limit {self.max_per_client} per client)",
+                    retry_after=1,
+                )
+            in_flight = sum(record["seconds"] for record in state.values())
+            if in_flight > 0.0 and in_flight + seconds > self.max_worker_seconds:
+                raise AdmissionError(
+                    503,
+                    "The server is busy, please retry shortly",
+                    retry_after=max(1, int(in_flight + 0.5)),
+                )
+            record = state.setdefault(str(os.getpid()), {"clients": {}, "seconds": 0.0})
+            record["clients"][client] = record["clients"].get(client, 0) + 1
+            record["seconds"] += seconds
+
+        try:
+            yield
+        finally:
+            with self._state() as state:
+                record = state.setdefault(str(os.getpid()), {"clients": {}, "seconds": 0.0})
+                record["seconds"] = max(0.0, record["seconds"] - seconds)
+                remaining = record["clients"].get(client, 1) - 1
+                if remaining > 0:
+                    record["clients"][client] = remaining
+                else:
+                    record["clients"].pop(client, None)
+                if not record["clients"]:
+                    state.pop(str(os.getpid()), None)
+
+    @contextmanager
+    def _state(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        """Yield the per-process records, persisting them if no error is raised."""
+
+        with self._lock:
+            if self.state_path is None:
+                yield self._local
+                return
+            with open(self.state_path, "a+", encoding="utf-8") as handle, _flock(handle):
+                handle.seek(0)
+                try:
+                    state = json.loads(handle.read() or "{}")
+                except ValueError:
+                    state = {}
+                if not isinstance(state, dict):
+                    state = {}
+                state = {pid: record for pid, record in state.items() if _process_alive(pid)}
+                yield state
+                handle.seek(0)
+                handle.truncate()
+                json.dump(state, handle)
+                handle.flush()
+
+
+@contextmanager
+def _flock(handle: Any) -> Iterator[None]:
+    """Hold an exclusive ``fcntl`` lock on the open file ``handle``."""
+
+    if fcntl is None:  # pragma: no cover - Windows development machines
+        yield
+        return
+    fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _process_alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except OSError:  # e.g. EPERM: the process exists but belongs to someone else
+        return True
+    return True
+
+
+__all__ = ["AdmissionController", "AdmissionError", "CostModel", "calibrate", "shared_cost_model"]
@@ -1,14 +1,38 @@
 # -*- coding: utf-8 -*-
 """Flask API backend for the Electoral Monte Carlo Simulator."""
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
-from Electoral_Montecarlo import MontecarloElectoral, ElectionData
+from werkzeug.middleware.proxy_fix import ProxyFix
+from Electoral_Montecarlo import MontecarloElectoral, ElectionData, RngStreams, run_scenario
+from template_library import TemplateLibrary
+from admission import AdmissionController, AdmissionError, CostModel, shared_cost_model
+from response_encoding import encode, pack_histogram
+from sweep import build_grid, run_sweep
+import functools
+import hashlib
+import json
 import os
 
 app = Flask(__name__, static_folder='static')
 CORS(app)
 
+# X-Forwarded-For is only trusted when the app runs behind that many proxies.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+PARTITI_DIR = os.path.join(os.path.dirname(__file__), 'Partiti')
+
+# Defaults shared by /api/simulate and the template warm-up; they mirror the
+# initial values of the controls in static/index.html.
+DEFAULT_SETTINGS = {
+    'seats': 400,
+    'proportional': 50,
+    'majoritarian': 50,
+    'iterations': 1000,
+}
+
 
 @app.route('/')
 def index():
@@ -22,137 +46,418 @@ def serve_static(path):
     return send_from_directory('static', path)
 
 
+def _build_entities(parties_data, coalitions_data):
+    """Group parties into coalitions, returning names, shares and majoritarian weights."""
+    # If there are coalitions, group parties by coalition
+    if coalitions_data and any(c.get('parties', []) for c in coalitions_data):
+        # Calculate coalition vote shares
+        entities = []
+        shares = []
+        majoritarian_shares = []
+
+        # Track which parties are in coalitions
+        parties_in_coalitions = set()
+        for coalition in coalitions_data:
+            if coalition.get('parties'):
+                parties_in_coalitions.update(coalition['parties'])
+
+        # Add coalitions
+        for coalition in coalitions_data:
+            if coalition.get('parties'):
+                coalition_share = 0.0
+                coalition_maj_share = 0.0
+                for party_name in coalition['parties']:
+                    for p in parties_data:
+                        if p['name'] == party_name:
+                            base_share = float(p.get('share', 0)) / 100.0
+                            coalition_share += base_share
+                            # Apply +20% bonus for majoritarian if territorial bonus is set
+                            if p.get('territorialBonus', False):
+                                coalition_maj_share += base_share * 1.2
+                            else:
+                                coalition_maj_share += base_share
+                            break
+                entities.append(coalition['name'])
+                shares.append(coalition_share)
+                majoritarian_shares.append(coalition_maj_share)
+
+        # Add standalone parties (not in any coalition)
+        for party in parties_data:
+            if party['name'] not in parties_in_coalitions:
+                base_share = float(party.get('share', 0)) / 100.0
+                entities.append(party['name'])
+                shares.append(base_share)
+                # Apply +20% bonus for majoritarian if territorial bonus is set
+                if party.get('territorialBonus', False):
+                    majoritarian_shares.append(base_share * 1.2)
+                else:
+                    majoritarian_shares.append(base_share)
+    else:
+        # No coalitions, use individual parties
+        entities = [p['name'] for p in parties_data]
+        shares = [float(p.get('share', 0)) / 100.0 for p in parties_data]
+        majoritarian_shares = []
+        for p in parties_data:
+            base_share = float(p.get('share', 0)) / 100.0
+            if p.get('territorialBonus', False):
+                majoritarian_shares.append(base_share * 1.2)
+            else:
+                majoritarian_shares.append(base_share)
+
+    return entities, shares, majoritarian_shares
+
+
+def _parse_simulation_request(data):
+    """Turn an /api/simulate payload into the simulator configuration."""
+    parties_data = data.get('parties', [])
+    coalitions_data = data.get('coalitions', [])
+    entities, shares, majoritarian_shares = _build_entities(parties_data, coalitions_data)
+
+    return {
+        'name': data.get('name', 'Generic Election'),
+        'seats': int(data.get('seats', DEFAULT_SETTINGS['seats'])),
+        'proportional': float(data.get('proportional', DEFAULT_SETTINGS['proportional'])) / 100.0,
+        'majoritarian': float(data.get('majoritarian', DEFAULT_SETTINGS['majoritarian'])) / 100.0,
+        'iterations': int(data.get('iterations', DEFAULT_SETTINGS['iterations'])),
+        'entities': entities,
+        'shares': shares,
+        'majoritarian_shares': majoritarian_shares,
+        'coalitions': coalitions_data,
+        'covariance': bool(data.get('covariance', False)),
+        'distributions': bool(data.get('distributions', False)),
+    }
+
+
+def _config_fingerprint(config):
+    """Digest of everything that affects the simulated seats (not the name)."""
+    relevant = {key: value for key, value in config.items() if key != 'name'}
+    encoded = json.dumps(relevant, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+# One independent random stream per serving thread, all derived from a single
+# root seed (random per process unless SIMULATE_SEED is set).  SIMULATE_WORKER,
+# set by gunicorn.conf.py, keeps the streams of seeded workers apart.
+rng_streams = RngStreams(
+    int(os.environ['SIMULATE_SEED']) if os.environ.get('SIMULATE_SEED') else None,
+    worker=os.environ.get('SIMULATE_WORKER'),
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _compiled_scenario(entities, shares, majoritarian_shares, proportional, majoritarian, seats):
+    """Validate and compile a scenario; compiled scenarios are immutable and shared."""
+    simulator = MontecarloElectoral(election='scenario')
+    simulator._set_data(
+        name='scenario',
+        parties=entities,
+        proportional_shares=shares,
+        proportional_coefficient=proportional,
+        majoritarian_coefficient=majoritarian,
+        seats=seats,
+        majoritarian_shares=majoritarian_shares
+    )
+    simulator.check_import()
+    return simulator.compile()
+
+
+def _simulate_config(config):
+    """Run the simulation described by ``config`` and build the response body.
+
+    Returns a ``(body, status)`` pair so that the template warm-up can reuse
+    exactly the same code path as the HTTP endpoint.
+    """
+    name = config['name']
+    seats = config['seats']
+    proportional_pct = config['proportional']
+    majoritarian_pct = config['majoritarian']
+    iterations = config['iterations']
+    entities = config['entities']
+    coalitions_data = config['coalitions']
+
+    # Validate we have at least one entity
+    if not entities:
+        return {'error': 'At least one party is required'}, 400
+    if iterations <= 0:
+        return {'error': 'The number of iterations must be strictly positive'}, 400
+
+    # Compile (or reuse) the validated scenario
+    try:
+        scenario = _compiled_scenario(
+            tuple(entities),
+            tuple(config['shares']),
+            tuple(config['majoritarian_shares']),
+            proportional_pct,
+            majoritarian_pct,
+            seats,
+        )
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    # Run simulation on this thread's random stream, without keeping history
+    # and with the optional accumulators only when they were requested
+    simulation = run_scenario(
+        scenario,
+        iterations,
+        rng_streams.local(),
+        covariance=config['covariance'],
+        distributions=config['distributions'],
+    )
+    results = simulation.expected
+
+    # Prepare response with detailed results
+    result_list = []
+    for entity, seat_count in sorted(results.items(), key=lambda x: x[1], reverse=True):
+        # Find if this is a coalition and get its parties
+        is_coalition = False
+        member_parties = []
+        for c in coalitions_data:
+            if c['name'] == entity:
+                is_coalition = True
+                member_parties = c.get('parties', [])
+                break
+
+        result_list.append({
+            'name': entity,
+            'seats': seat_count,
+            'percentage': round(seat_count / seats * 100, 1) if seats > 0 else 0,
+            'isCoalition': is_coalition,
+            'memberParties': member_parties
+        })
+
+    body = {
+        'success': True,
+        'results': result_list,
+        'config': {
+            'name': name,
+            'totalSeats': seats,
+            'proportional': proportional_pct * 100,
+            'majoritarian': majoritarian_pct * 100,
+            'iterations': iterations
+        }
+    }
+    if config['covariance']:
+        body['covariance'] = simulation.covariance.covariance()
+        body['correlation'] = simulation.covariance.correlation()
+    if config['distributions']:
+        body['distributions'] = {
+            entity: pack_histogram(histogram)
+            for entity, histogram in simulation.distributions.items()
+        }
+    return body, 200
+
+
+def _negotiated_response(body, status=200):
+    """Serialise ``body`` in the format and compression asked for by the client."""
+    payload, headers = encode(
+        body,
+        request.headers.get('Accept', ''),
+        request.headers.get('Accept-Encoding', ''),
+    )
+    return Response(payload, status=status, headers=headers)
+
+
+def _simulate_template(template, settings):
+    """Simulate a Partiti template the way the UI does right after loading it."""
+    if isinstance(template, list):
+        template = {'parties': template}
+    parties = [
+        {'name': p.get('name') or p.get('party') or 'Partito', 'share': p.get('share', 10)}
+        for p in template.get('parties', [])
+    ]
+    payload = dict(settings)
+    payload.update({
+        'name': template.get('name', 'Generic Election'),
+        'parties': parties,
+        'coalitions': template.get('coalitions', []),
+    })
+    config = _parse_simulation_request(payload)
+    body, status = _simulate_config(config)
+    if status != 200:
+        raise ValueError(body.get('error', 'Simulation failed'))
+    return _config_fingerprint(config), body
+
+
+def _client_key():
+    """Identify the caller (``remote_addr`` is rewritten by ProxyFix behind trusted proxies)."""
+    return request.remote_addr or 'unknown'
+
+
+# Admission control: the cost model is calibrated once per machine and shared
+# by the workers through SIMULATE_COST_PATH, unless SIMULATE_COST_RATE (cost
+# units per second) pins it explicitly.  The concurrency counters are shared
+# by all workers through SIMULATE_STATE_PATH.
+admission = AdmissionController(
+    cost_model=(
+        CostModel(units_per_second=float(os.environ['SIMULATE_COST_RATE']))
+        if os.environ.get('SIMULATE_COST_RATE') else shared_cost_model(os.environ.get(
+            'SIMULATE_COST_PATH',
+            os.path.join(os.path.dirname(__file__), 'Results', 'cost_model.json'),
+        ))
+    ),
+    max_request_seconds=float(os.environ.get('SIMULATE_MAX_SECONDS', 10)),
+    max_worker_seconds=float(os.environ.get('SIMULATE_WORKER_SECONDS', 20)),
+    max_per_client=int(os.environ.get('SIMULATE_MAX_PER_CLIENT', 2)),
+    state_path=os.environ.get(
+        'SIMULATE_STATE_PATH',
+        os.path.join(os.path.dirname(__file__), 'Results', 'admission_state.json'),
+    ),
+)
+
+# Sweeps are also capped in grid points (response size) and histogram cells
+# (K × (m + 1) counters per distinct majoritarian tier m).
+SWEEP_MAX_POINTS = int(os.environ.get('SWEEP_MAX_POINTS', 500))
+SWEEP_MAX_CELLS = int(os.environ.get('SWEEP_MAX_CELLS', 1_000_000))
+
+
+templates = TemplateLibrary(
+    directory=PARTITI_DIR,
+    index_path=os.environ.get(
+        'TEMPLATE_CACHE_PATH',
+        os.path.join(os.path.dirname(__file__), 'Results', 'template_cache.json'),
+    ),
+    simulate=_simulate_template,
+    settings=DEFAULT_SETTINGS,
+)
+templates.refresh()
+if os.environ.get('TEMPLATE_WARMUP', '1') != '0':
+    templates.start(interval=float(os.environ.get('TEMPLATE_RESCAN_INTERVAL', 60)))
+
+
 @app.route('/api/simulate', methods=['POST'])
 def simulate():
     """Run a Monte Carlo simulation with the provided configuration."""
     try:
         data = request.get_json()
+        config = _parse_simulation_request(data)
 
-        # Extract configuration
-        name = data.get('name', 'Generic Election')
-        seats = int(data.get('seats', 400))
-        proportional_pct = float(data.get('proportional', 50)) / 100.0
-        majoritarian_pct = float(data.get('majoritarian', 50)) / 100.0
-        iterations = int(data.get('iterations', 1000))
-
-        # Handle parties and coalitions
-        parties_data = data.get('parties', [])
-        coalitions_data = data.get('coalitions', [])
-
-        # Build lookup for territorial bonus
-        territorial_bonus_map = {p['name']: p.get('territorialBonus', False) for p in parties_data}
-
-        # If there are coalitions, group parties by coalition
-        if coalitions_data and any(c.get('parties', []) for c in coalitions_data):
-            # Calculate coalition vote shares
-            entities = []
-            shares = []
-            majoritarian_shares = []
-
-            # Track which parties are in coalitions
-            parties_in_coalitions = set()
-            for coalition in coalitions_data:
-                if coalition.get('parties'):
-                    parties_in_coalitions.update(coalition['parties'])
-
-            # Add coalitions
-            for coalition in coalitions_data:
-                if coalition.get('parties'):
-                    coalition_share = 0.0
-                    coalition_maj_share = 0.0
-                    for party_name in coalition['parties']:
-                        for p in parties_data:
-                            if p['name'] == party_name:
-                                base_share = float(p.get('share', 0)) / 100.0
-                                coalition_share += base_share
-                                # Apply +20% bonus for majoritarian if territorial bonus is set
-                                if p.get('territorialBonus', False):
-                                    coalition_maj_share += base_share * 1.2
-                                else:
-                                    coalition_maj_share += base_share
-                                break
-                    entities.append(coalition['name'])
-                    shares.append(coalition_share)
-                    majoritarian_shares.append(coalition_maj_share)
-
-            # Add standalone parties (not in any coalition)
-            for party in parties_data:
-                if party['name'] not in parties_in_coalitions:
-                    base_share = float(party.get('share', 0)) / 100.0
-                    entities.append(party['name'])
-                    shares.append(base_share)
-                    # Apply +20% bonus for majoritarian if territorial bonus is set
-                    if party.get('territorialBonus', False):
-                        majoritarian_shares.append(base_share * 1.2)
-                    else:
-                        majoritarian_shares.append(base_share)
-        else:
-            # No coalitions, use individual parties
-            entities = [p['name'] for p in parties_data]
-            shares = [float(p.get('share', 0)) / 100.0 for p in parties_data]
-            majoritarian_shares = []
-            for p in parties_data:
-                base_share = float(p.get('share', 0)) / 100.0
-                if p.get('territorialBonus', False):
-                    majoritarian_shares.append(base_share * 1.2)
-                else:
-                    majoritarian_shares.append(base_share)
+        # Template defaults are precomputed at startup: serve them directly.
+        cached = templates.cached_result(_config_fingerprint(config))
+        if cached is not None:
+            body = dict(cached)
+            body['config'] = dict(cached['config'], name=config['name'])
+            return _negotiated_response(body)
 
-        # Validate we have at least one entity
-        if not entities:
+        if config['iterations'] <= 0:
+            return jsonify({'error': 'The number of iterations must be strictly positive'}), 400
+
+        # Budget the request before running it
+        requested_iterations = config['iterations']
+        try:
+            iterations, estimate = admission.plan(
+                requested_iterations,
+                int(round(config['seats'] * config['majoritarian'])),
+                len(config['entities']),
+                allow_downgrade=bool(data.get('allowDowngrade', False)),
+                covariance=config['covariance'],
+            )
+            config['iterations'] = iterations
+            with admission.admit(_client_key(), estimate):
+                body, status = _simulate_config(config)
+        except AdmissionError as e:
+            response = jsonify(dict(e.details, error=str(e)))
+            if e.retry_after is not None:
+                response.headers['Retry-After'] = str(e.retry_after)
+            return response, e.status
+
+        if status != 200:
+            return jsonify(body), status
+        if iterations != requested_iterations:
+            body['config']['downgraded'] = True
+            body['config']['requestedIterations'] = requested_iterations
+        return _negotiated_response(body)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/sweep', methods=['POST'])
+def sweep_split():
+    """Sweep the proportional share (and optionally the seats) for one set of shares."""
+    try:
+        data = request.get_json()
+        config = _parse_simulation_request(data)
+
+        if not config['entities']:
             return jsonify({'error': 'At least one party is required'}), 400
+        if config['iterations'] <= 0:
+            return jsonify({'error': 'The number of iterations must be strictly positive'}), 400
 
-        # Create simulation
-        simulator = MontecarloElectoral(election=name)
-        simulator._set_data(
-            name=name,
-            parties=entities,
-            proportional_shares=shares,
-            proportional_coefficient=proportional_pct,
-            majoritarian_coefficient=majoritarian_pct,
-            seats=seats,
-            majoritarian_shares=majoritarian_shares
-        )
+        # Grid: proportional percentages up to the combined coverage, and seats
+        coverage = config['proportional'] + config['majoritarian']
+        proportional_grid = data.get('proportionalGrid') or [coverage * 10 * step for step in range(11)]
+        coefficients = [float(value) / 100.0 for value in proportional_grid]
+        seats_grid = [int(value) for value in (data.get('seatsGrid') or [config['seats']])]
 
-        # Validate
+        simulator = MontecarloElectoral(election=config['name'])
         try:
+            simulator._set_data(
+                name=config['name'],
+                parties=config['entities'],
+                proportional_shares=config['shares'],
+                proportional_coefficient=config['proportional'],
+                majoritarian_coefficient=config['majoritarian'],
+                seats=config['seats'],
+                majoritarian_shares=config['majoritarian_shares']
+            )
             simulator.check_import()
+            grid = build_grid(coefficients, seats_grid, coverage, len(config['entities']))
         except ValueError as e:
             return jsonify({'error': str(e)}), 400
 
-        # Run simulation
-        results = simulator.complete_simulation(iterations=iterations)
-
-        # Prepare response with detailed results
-        result_list = []
-        for entity, seat_count in sorted(results.items(), key=lambda x: x[1], reverse=True):
-            # Find if this is a coalition and get its parties
-            is_coalition = False
-            member_parties = []
-            for c in coalitions_data:
-                if c['name'] == entity:
-                    is_coalition = True
-                    member_parties = c.get('parties', [])
-                    break
-
-            result_list.append({
-                'name': entity,
-                'seats': seat_count,
-                'percentage': round(seat_count / seats * 100, 1) if seats > 0 else 0,
-                'isCoalition': is_coalition,
-                'memberParties': member_parties
-            })
-
-        return jsonify({
+        # Bound the response size and the histogram memory before budgeting
+        if len(grid.points) > SWEEP_MAX_POINTS:
+            return jsonify({
+                'error': f'The sweep grid has {len(grid.points)} points, above the limit of {SWEEP_MAX_POINTS}',
+                'points': len(grid.points),
+                'maxPoints': SWEEP_MAX_POINTS,
+            }), 422
+        if grid.histogram_cells > SWEEP_MAX_CELLS:
+            return jsonify({
+                'error': 'The sweep grid needs too many histogram cells; '
+                         'reduce the seat counts, the grid or the parties',
+                'cells': grid.histogram_cells,
+                'maxCells': SWEEP_MAX_CELLS,
+            }), 422
+
+        # Every iteration draws the largest tier and snapshots every tier
+        requested_iterations = config['iterations']
+        try:
+            iterations, estimate = admission.plan_units(
+                requested_iterations,
+                grid.iteration_units(),
+                grid.fixed_units(),
+                allow_downgrade=bool(data.get('allowDowngrade', False)),
+            )
+            with admission.admit(_client_key(), estimate):
+                points = run_sweep(
+                    simulator.data,
+                    coefficients,
+                    seats=seats_grid,
+                    iterations=iterations,
+                    coverage=coverage,
+                    level=float(data.get('level', 0.9)),
+                )
+        except AdmissionError as e:
+            response = jsonify(dict(e.details, error=str(e)))
+            if e.retry_after is not None:
+                response.headers['Retry-After'] = str(e.retry_after)
+            return response, e.status
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        config_body = {
+            'name': config['name'],
+            'coverage': coverage * 100,
+            'iterations': iterations,
+        }
+        if iterations != requested_iterations:
+            config_body['downgraded'] = True
+            config_body['requestedIterations'] = requested_iterations
+        return _negotiated_response({
             'success': True,
-            'results': result_list,
-            'config': {
-                'name': name,
-                'totalSeats': seats,
-                'proportional': proportional_pct * 100,
-                'majoritarian': majoritarian_pct * 100,
-                'iterations': iterations
-            }
+            'points': [point.to_dict() for point in points],
+            'config': config_body,
         })
 
     except Exception as e:
@@ -162,25 +467,34 @@ def simulate():
 @app.route('/api/parties-templates')
 def get_parties_templates():
     """Get list of available party template files."""
-    partiti_dir = os.path.join(os.path.dirname(__file__), 'Partiti')
-    templates = []
-    if os.path.exists(partiti_dir):
-        for f in os.listdir(partiti_dir):
-            if f.endswith('.json'):
-                templates.append(f)
-    return jsonify({'templates': templates})
+    response = jsonify({'templates': templates.templates()})
+    response.set_etag(templates.etag)
+    return response.make_conditional(request)
 
 
 @app.route('/api/parties-template/<filename>')
 def get_parties_template(filename):
     """Get a specific party template JSON file."""
-    partiti_dir = os.path.join(os.path.dirname(__file__), 'Partiti')
     if not filename.endswith('.json'):
         return jsonify({'error': 'Invalid file type'}), 400
-    filepath = os.path.join(partiti_dir, filename)
-    if not os.path.exists(filepath):
+    if templates.entry(filename) is None:
+        return jsonify({'error': 'Template not found'}), 404
+    return send_from_directory(PARTITI_DIR, filename)
+
+
+@app.route('/api/parties-template/<filename>/results')
+def get_parties_template_results(filename):
+    """Get the precomputed default simulation of a party template."""
+    if not filename.endswith('.json'):
+        return jsonify({'error': 'Invalid file type'}), 400
+    entry = templates.result(filename)
+    if entry is None:
         return jsonify({'error': 'Template not found'}), 404
-    return send_from_directory(partiti_dir, filename)
+    if entry.error is not None:
+        return jsonify({'error': entry.error}), 400
+    response = jsonify(entry.result)
+    response.set_etag(entry.content_hash)
+    return response.make_conditional(request)
 
 
 @app.route('/api/validate', methods=['POST'])
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""Backtest the simulator against historical election outcomes.
+
+A catalog lists pairs of election inputs (the TXT/XLS files understood by
+:class:`MontecarloElectoral`) and the seats actually assigned, in the format of
+``Elections/Real_Election_for_Confrontation.txt``.  Every case is simulated in
+its own process and scored from the streamed seat distributions:
+
+* ``error`` – expected minus real seats;
+* ``covered`` – whether the real outcome lies in the central predictive interval;
+* ``crps`` – continuous ranked probability score of the empirical distribution
+  (in seats, lower is better);
+* ``log_score`` – negative log-probability of the real seat count, with add-half
+  smoothing over ``0..seats`` so that unseen outcomes stay finite (lower is
+  better);
+* ``pit`` – mid probability integral transform, ideally uniform across parties
+  and elections.
+
+Run ``python backtesting.py Elections/backtest_catalog.json`` to print a report.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from Electoral_Montecarlo import MontecarloElectoral
+
+
+@dataclass(frozen=True)
+class BacktestCase:
+    """An election input paired with the seats that were actually assigned."""
+
+    name: str
+    election_path: str
+    real_path: str
+
+
+@dataclass
+class PartyScore:
+    """Forecast quality for a single party of a single election."""
+
+    party: str
+    real: float
+    expected: float
+    interval: Tuple[int, int]
+    covered: bool
+    crps: float
+    log_score: float
+    pit: float
+
+    @property
+    def error(self) -> float:
+        return self.expected - self.real
+
+
+@dataclass
+class CaseResult:
+    """Scores of every party of a backtested election."""
+
+    case: BacktestCase
+    election: str
+    seats: int
+    parties: List[PartyScore] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+@dataclass
+class BacktestReport:
+    """Results of a backtest run with aggregate calibration statistics."""
+
+    level: float
+    cases: List[CaseResult] = field(default_factory=list)
+
+    def scores(self) -> List[PartyScore]:
+        return [score for case in self.cases for score in case.parties]
+
+    def summary(self) -> Dict[str, float]:
+        scores = self.scores()
+        if not scores:
+            return {"parties": 0}
+        count = len(scores)
+        return {
+            "elections": sum(1 for case in self.cases if case.error is None),
+            "failed": sum(1 for case in self.cases if case.error is not None),
+            "parties": count,
+            "mean_absolute_error": sum(abs(score.error) for score in scores) / count,
+            "rmse": math.sqrt(sum(score.error ** 2 for score in scores) / count),
+            "nominal_coverage": self.level,
+            "coverage": sum(1 for score in scores if score.covered) / count,
+            "mean_crps": sum(score.crps for score in scores) / count,
+            "mean_log_score": sum(score.log_score for score in scores) / count,
+            "mean_pit": sum(score.pit for score in scores) / count,
+        }
+
+    def format(self) -> str:
+        lines: List[str] = []
+        for case in self.cases:
+            lines.append(f"{case.case.name} ({case.election})")
+            if case.error is not None:
+                lines.extend([f"  failed: {case.error}", ""])
+                continue
+            lines.append(
+                f"  {'party':<24} {'real':>6} {'expected':>9} {'error':>8} "
+                f"{'interval':>12} {'crps':>8} {'log':>7} {'pit':>6}"
+            )
+            for score in case.parties:
+                interval = f"[{score.interval[0]}, {score.interval[1]}]"
+                lines.append(
+                    f"  {score.party:<24} {score.real:>6g} {score.expected:>9.2f} {score.error:>8.2f} "
+                    f"{interval:>12}{'' if score.covered else '*'} {score.crps:>8.3f} "
+                    f"{score.log_score:>7.3f} {score.pit:>6.3f}"
+                )
+            lines.append("")
+        lines.append("Summary")
+        for key, value in self.summary().items():
+            lines.append(f"  {key:<20} {value:.4g}" if isinstance(value, float) else f"  {key:<20} {value}")
+        return "\n".join(lines)
+
+
+# ----------------------------------------------------------------------
+# Scoring of discrete predictive distributions
+# ----------------------------------------------------------------------
+def _cumulative(distribution: Mapping[int, int]) -> Tuple[List[int], List[float]]:
+    total = sum(distribution.values())
+    support = sorted(distribution)
+    cdf: List[float] = []
+    running = 0
+    for value in support:
+        running += distribution[value]
+        cdf.append(running / total)
+    return support, cdf
+
+
+def quantile(distribution: Mapping[int, int], probability: float) -> int:
+    """Smallest seat count whose cumulative probability reaches ``probability``."""
+
+    support, cdf = _cumulative(distribution)
+    for value, cumulative in zip(support, cdf):
+        if cumulative >= probability - 1e-12:
+            return value
+    return support[-1]
+
+
+def crps(distribution: Mapping[int, int], observation: float) -> float:
+    """Exact CRPS of the empirical step CDF against ``observation``."""
+
+    support, cdf = _cumulative(distribution)
+    breakpoints = sorted(set(support) | {observation})
+    score = 0.0
+    position = 0
+    current = 0.0
+    for left, right in zip(breakpoints, breakpoints[1:]):
+        while position < len(support) and support[position] <= left:
+            current = cdf[position]
+            position += 1
+        indicator = 1.0 if left >= observation else 0.0
+        score += (current - indicator) ** 2 * (right - left)
+    return score
+
+
+def log_score(distribution: Mapping[int, int], observation: float, seats: int) -> float:
+    """Negative log-probability of ``observation`` with add-half smoothing."""
+
+    total = sum(distribution.values())
+    count = distribution.get(int(round(observation)), 0)
+    return -math.log((count + 0.5) / (total + 0.5 * (seats + 1)))
+
+
+def pit(distribution: Mapping[int, int], observation: float) -> float:
+    """Mid probability integral transform ``P(X < y) + P(X = y) / 2``."""
+
+    total = sum(distribution.values())
+    below = sum(count for value, count in distribution.items() if value < observation)
+    equal = sum(count for value, count in distribution.items() if value == observation)
+    return (below + 0.5 * equal) / total
+
+
+# ----------------------------------------------------------------------
+# Running backtests
+# ----------------------------------------------------------------------
+def load_catalog(path: str) -> List[BacktestCase]:
+    """Read a JSON catalog of ``{"name", "election", "real"}`` entries.
+
+    Relative paths are resolved against the directory of the catalog.
+    """
+
+    catalog = Path(path)
+    base = catalog.resolve().parent
+    entries = json.loads(catalog.read_text(encoding="utf-8"))
+    if isinstance(entries, dict):
+        entries = entries.get("cases", [])
+
+    cases = []
+    for entry in entries:
+        election = base / entry["election"]
+        cases.append(
+            BacktestCase(
+                name=str(entry.get("name", election.stem)),
+                election_path=str(election),
+                real_path=str(base / entry["real"]),
+            )
+        )
+    return cases
+
+
+def run_case(
+    case: BacktestCase,
+    iterations: int = 10_000,
+    seed: Optional[int] = None,
+    level: float = 0.9,
+) -> CaseResult:
+    """Simulate ``case`` and score every party that has a real outcome."""
+
+    simulator = MontecarloElectoral(election=case.name)
+    try:
+        if Path(case.election_path).suffix.lower() in {".xls", ".xlsx"}:
+            simulator.import_as_excel(case.election_path)
+        else:
+            simulator.import_as_txt(case.election_path)
+        simulator.check_import()
+        real = simulator._load_real_results(Path(case.real_path))
+        if not real:
+            raise ValueError(f"No real results found in {case.real_path}")
+        simulator.complete_simulation(iterations=iterations, seed=seed, keep_history=False)
+    except (OSError, RuntimeError, ValueError) as exc:
+        return CaseResult(case=case, election=simulator.data.name, seats=simulator.data.seats, error=str(exc))
+
+    tail = (1.0 - level) / 2.0
+    result = CaseResult(case=case, election=simulator.data.name, seats=simulator.data.seats)
+    for party in simulator.data.parties:
+        if party not in real:
+            continue
+        distribution = simulator.distributions[party]
+        observation = real[party]
+        total = sum(distribution.values())
+        expected = sum(value * count for value, count in distribution.items()) / total
+        interval = (quantile(distribution, tail), quantile(distribution, 1.0 - tail))
+        result.parties.append(
+            PartyScore(
+                party=party,
+                real=observation,
+                expected=expected,
+                interval=interval,
+                covered=interval[0] <= observation <= interval[1],
+                crps=crps(distribution, observation),
+                log_score=log_score(distribution, observation, simulator.data.seats),
+                pit=pit(distribution, observation),
+            )
+        )
+    return result
+
+
+def run_backtest(
+    cases: Sequence[BacktestCase],
+    iterations: int = 10_000,
+    seed: Optional[int] = None,
+    level: float = 0.9,
+    workers: Optional[int] = None,
+) -> BacktestReport:
+    """Simulate all ``cases`` in parallel processes and collect their scores.
+
+    Case ``i`` uses ``seed + i`` so that a seeded run is reproducible no matter
+    how the cases are scheduled.  ``workers=1`` runs everything in-process.
+    """
+
+    if not 0.0 < level < 1.0:
+        raise ValueError("The interval level must lie in (0, 1)")
+
+    seeds = [None if seed is None else seed + index for index in range(len(cases))]
+    if workers == 1 or len(cases) <= 1:
+        results = [run_case(case, iterations, case_seed, level) for case, case_seed in zip(cases, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                pool.map(
+                    run_case,
+                    cases,
+                    [iterations] * len(cases),
+                    seeds,
+                    [level] * len(cases),
+                )
+            )
+    return BacktestReport(level=level, cases=results)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest the simulator against real elections")
+    parser.add_argument("catalog", help="JSON catalog of election/real-result pairs")
+    parser.add_argument("--iterations", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--level", type=float, default=0.9, help="Nominal coverage of the intervals")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel processes (default: CPU count)")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_backtest(
+        load_catalog(args.catalog),
+        iterations=args.iterations,
+        seed=args.seed,
+        level=args.level,
+        workers=args.workers,
+    )
+    text = report.format()
+    print(text)
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(text + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""Gunicorn settings picked up automatically when started from this folder."""
+
+import os
+
+
+def post_fork(server, worker):
+    # Give every worker a distinct, reproducible identifier before it imports
+    # the application, so that SIMULATE_SEED yields independent random streams
+    # per worker (see RngStreams in Electoral_Montecarlo.py).
+    os.environ["SIMULATE_WORKER"] = str(worker.age)
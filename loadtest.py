@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""Local load-testing harness for the Flask API.
+
+The script starts ``app:app`` under Gunicorn (or targets an already running
+server via ``--url``), replays a mix of ``/api/simulate`` requests built from the
+``Partiti`` templates at a fixed concurrency and reports throughput, latency
+percentiles, error rate and the CPU time consumed by every Gunicorn worker::
+
+    python loadtest.py --workers 4 --concurrency 16 --duration 30 \\
+        --iterations 1000 10000 --party-counts 3 8
+
+The mix is the cartesian product of templates, party counts and iteration
+counts.  Only the standard library is required on the client side; per-worker
+CPU usage is read from ``/proc`` and therefore only reported on Linux.
+
+Every client connects from ``127.0.0.1``, which the server's per-client
+admission limit would treat as a single caller.  The spawned server therefore
+gets admission limits sized to ``--concurrency`` (and a private admission state
+file) unless ``--server-limits`` asks to keep the configured ones.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent
+
+
+@dataclass(frozen=True)
+class RequestSpec:
+    """One entry of the replayed request mix."""
+
+    label: str
+    payload: bytes
+
+
+@dataclass
+class Sample:
+    """Outcome of a single request; ``status`` is ``0`` when no response arrived."""
+
+    label: str
+    latency: float
+    status: int
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200
+
+
+@dataclass
+class Report:
+    """Aggregated statistics of a load-test run."""
+
+    duration: float
+    samples: List[Sample] = field(default_factory=list)
+    worker_cpu: Dict[int, float] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, object]:
+        by_label: Dict[str, List[Sample]] = {}
+        for sample in self.samples:
+            by_label.setdefault(sample.label, []).append(sample)
+        groups = {"all": self.samples, **dict(sorted(by_label.items()))}
+
+        summary: Dict[str, object] = {
+            "duration": round(self.duration, 3),
+            "groups": {label: _group_stats(samples, self.duration) for label, samples in groups.items()},
+        }
+        if self.worker_cpu:
+            summary["workers"] = {
+                str(pid): {
+                    "cpu_seconds": round(seconds, 3),
+                    "utilisation": round(seconds / self.duration, 3) if self.duration else 0.0,
+                }
+                for pid, seconds in sorted(self.worker_cpu.items())
+            }
+        return summary
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile ``q`` (in ``[0, 100]``) of sorted ``values``."""
+
+    if not values:
+        return float("nan")
+    position = (len(values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _group_stats(samples: Sequence[Sample], duration: float) -> Dict[str, object]:
+    latencies = sorted(sample.latency for sample in samples)
+    errors = sum(1 for sample in samples if not sample.ok)
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+    return {
+        "requests": len(samples),
+        "throughput": round(len(samples) / duration, 3) if duration else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+# ----------------------------------------------------------------------
+# Request mix
+# ----------------------------------------------------------------------
+def build_request_mix(
+    templates_dir: Path,
+    iterations: Sequence[int],
+    party_counts: Sequence[int],
+    seats: int = 400,
+    proportional: float = 50,
+    majoritarian: float = 50,
+) -> List[RequestSpec]:
+    """Build ``/api/simulate`` payloads from every template in ``templates_dir``.
+
+    Each template contributes its largest ``n`` parties for every ``n`` in
+    ``party_counts``.  Shares are renormalised to sum to 100% so that templates
+    without explicit shares can be replayed as well.
+    """
+
+    mix: List[RequestSpec] = []
+    for path in sorted(templates_dir.glob("*.json")):
+        template = json.loads(path.read_text(encoding="utf-8"))
+        parties = template if isinstance(template, list) else template.get("parties", [])
+        ranked = sorted(
+            (
+                (p.get("name") or p.get("party") or f"Party {index}", float(p.get("share", 1.0)))
+                for index, p in enumerate(parties)
+            ),
+            key=lambda item: -item[1],
+        )
+        for count in party_counts:
+            chosen = ranked[:count]
+            if not chosen:
+                continue
+            total = sum(share for _, share in chosen) or 1.0
+            party_payload = [
+                {"name": name, "share": round(share / total * 99.0, 4)} for name, share in chosen
+            ]
+            for iteration_count in iterations:
+                body = {
+                    "name": f"loadtest-{path.stem}",
+                    "seats": seats,
+                    "proportional": proportional,
+                    "majoritarian": majoritarian,
+                    "iterations": iteration_count,
+                    "parties": party_payload,
+                    "coalitions": [],
+                }
+                label = f"{path.stem} parties={len(chosen)} iterations={iteration_count}"
+                mix.append(RequestSpec(label=label, payload=json.dumps(body).encode("utf-8")))
+    return mix
+
+
+# ----------------------------------------------------------------------
+# Server management
+# ----------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def admission_env(concurrency: int, state_path: str) -> Dict[str, str]:
+    """Admission settings letting ``concurrency`` local clients run at once.
+
+    The per-client limit is raised to the concurrency and the in-flight budget
+    to ``concurrency`` requests of the largest admissible size, so only the
+    per-request budget (``SIMULATE_MAX_SECONDS``) still refuses requests.
+    """
+
+    max_seconds = float(os.environ.get("SIMULATE_MAX_SECONDS", 10))
+    return {
+        "SIMULATE_MAX_PER_CLIENT": str(concurrency),
+        "SIMULATE_WORKER_SECONDS": str(concurrency * max_seconds),
+        "SIMULATE_STATE_PATH": state_path,
+    }
+
+
+def start_server(
+    workers: int,
+    port: int,
+    extra_args: Sequence[str] = (),
+    env: Optional[Dict[str, str]] = None,
+) -> subprocess.Popen:
+    """Spawn ``gunicorn app:app`` bound to ``127.0.0.1:port``.
+
+    ``env`` overrides variables of the current environment for the server.
+    """
+
+    command = [
+        sys.executable, "-m", "gunicorn", "app:app",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        *extra_args,
+    ]
+    return subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, env={**os.environ, **(env or {})})
+
+
+def wait_until_ready(
+    host: str,
+    port: int,
+    timeout: float = 30.0,
+    server: Optional[subprocess.Popen] = None,
+) -> None:
+    """Poll the API until it answers, giving up early if ``server`` exits."""
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Gunicorn exited with status {server.returncode} before becoming ready")
+        connection = http.client.HTTPConnection(host, port, timeout=1.0)
+        try:
+            connection.request("GET", "/api/parties-templates")
+            if connection.getresponse().status == 200:
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.1)
+    raise RuntimeError(f"The server on {host}:{port} did not become ready within {timeout}s")
+
+
+def worker_pids(master_pid: int) -> List[int]:
+    """Return the pids of the processes forked by the Gunicorn master."""
+
+    children = Path(f"/proc/{master_pid}/task/{master_pid}/children")
+    try:
+        return [int(pid) for pid in children.read_text().split()]
+    except OSError:
+        return []
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User plus system CPU time of ``pid`` read from ``/proc/<pid>/stat``."""
+
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return None
+    # The command name may contain spaces, so split after its closing bracket.
+    fields = stat[stat.rindex(")") + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+# ----------------------------------------------------------------------
+# Load generation
+# ----------------------------------------------------------------------
+def run_load(
+    host: str,
+    port: int,
+    mix: Sequence[RequestSpec],
+    concurrency: int,
+    duration: float,
+    seed: Optional[int] = None,
+    timeout: float = 300.0,
+) -> List[Sample]:
+    """Replay random entries of ``mix`` from ``concurrency`` threads."""
+
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    headers = {"Content-Type": "application/json"}
+
+    def _client(index: int) -> None:
+        rng = random.Random(None if seed is None else seed + index)
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        local: List[Sample] = []
+        while time.monotonic() < deadline:
+            spec = rng.choice(mix)
+            start = time.perf_counter()
+            try:
+                connection.request("POST", "/api/simulate", body=spec.payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 0
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=timeout)
+            local.append(Sample(spec.label, time.perf_counter() - start, status))
+        connection.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=_client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def format_report(summary: Dict[str, object]) -> str:
+    lines = [f"Duration: {summary['duration']} s", ""]
+    header = (
+        f"{'request':<60} {'n':>7} {'req/s':>9} {'err%':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        "  statuses"
+    )
+    lines.append(header)
+    lines.append("-" * len(header))
+    for label, stats in summary["groups"].items():  # type: ignore[union-attr]
+        statuses = " ".join(f"{status}:{count}" for status, count in stats["statuses"].items())
+        lines.append(
+            f"{label:<60} {stats['requests']:>7} {stats['throughput']:>9} "
+            f"{stats['error_rate'] * 100:>7.2f} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}"
+            f"  {statuses}"
+        )
+    workers = summary.get("workers")
+    if workers:
+        lines.extend(["", f"{'worker pid':<12} {'cpu s':>9} {'utilisation':>12}"])
+        for pid, stats in workers.items():  # type: ignore[union-attr]
+            lines.append(f"{pid:<12} {stats['cpu_seconds']:>9} {stats['utilisation'] * 100:>11.1f}%")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Target an already running server instead of spawning Gunicorn")
+    parser.add_argument("--workers", type=int, default=4, help="Gunicorn workers to spawn")
+    parser.add_argument("--gunicorn-arg", action="append", default=[], help="Extra Gunicorn argument (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client connections")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of sustained load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unrecorded load before measuring")
+    parser.add_argument("--iterations", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--party-counts", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--seats", type=int, default=400)
+    parser.add_argument("--templates", type=Path, default=ROOT / "Partiti")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the request selection")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument(
+        "--server-limits",
+        action="store_true",
+        help="Keep the server's admission limits instead of sizing them to --concurrency",
+    )
+    args = parser.parse_args(argv)
+
+    mix = build_request_mix(args.templates, args.iterations, args.party_counts, seats=args.seats)
+    if not mix:
+        parser.error(f"No templates found in {args.templates}")
+
+    server: Optional[subprocess.Popen] = None
+    state_dir: Optional[str] = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname or "127.0.0.1", target.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        env = None
+        if not args.server_limits:
+            state_dir = tempfile.mkdtemp(prefix="loadtest-")
+            env = admission_env(args.concurrency, os.path.join(state_dir, "admission_state.json"))
+        server = start_server(args.workers, port, args.gunicorn_arg, env=env)
+
+    try:
+        wait_until_ready(host, port, server=server)
+        if args.warmup > 0:
+            run_load(host, port, mix, args.concurrency, args.warmup, seed=args.seed)
+
+        pids = worker_pids(server.pid) if server is not None else []
+        before = {pid: cpu_seconds(pid) for pid in pids}
+        start = time.monotonic()
+        samples = run_load(host, port, mix, args.concurrency, args.duration, seed=args.seed)
+        elapsed = time.monotonic() - start
+        worker_cpu = {}
+        for pid, initial in before.items():
+            final = cpu_seconds(pid)
+            if initial is not None and final is not None:
+                worker_cpu[pid] = final - initial
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:  # pragma: no cover - stuck worker
+                server.kill()
+        if state_dir is not None:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+    summary = Report(duration=elapsed, samples=samples, worker_cpu=worker_cpu).summary()
+    print(json.dumps(summary, indent=2) if args.json else format_report(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
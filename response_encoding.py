@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Content negotiation and compact encodings for simulation responses.
+
+Seat distributions are packed as integer histograms – the lowest seat count
+plus the number of draws for each consecutive count – instead of per-iteration
+lists, so their size depends on the spread of the outcomes rather than on the
+number of iterations.  Bodies can then be serialised as
+
+* ``application/json`` (always available, the default);
+* ``application/msgpack`` when the optional ``msgpack`` package is installed;
+* ``application/x-electoral-columnar``: a small binary layout whose histogram
+  counts are little-endian ``int32`` columns that ``static/app.js`` maps onto
+  ``Int32Array`` views without copying.
+
+Any of them may additionally be compressed with ``br`` (optional ``brotli``
+package) or ``gzip`` according to ``Accept-Encoding``.
+
+Columnar layout::
+
+    b"EMC1" | uint32 LE header length H | JSON header (H bytes) | int32 LE data
+
+The header is padded with spaces so that the data block starts on a 4-byte
+boundary.  In the header every histogram is ``{"offset", "start", "length"}``
+where ``start`` and ``length`` index the data block in ``int32`` elements.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:  # pragma: no cover - optional dependency
+    import msgpack  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:  # pragma: no cover - optional dependency
+    import brotli  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR = "application/x-electoral-columnar"
+
+COLUMNAR_MAGIC = b"EMC1"
+
+# Payloads smaller than this are not worth compressing.
+MIN_COMPRESS_SIZE = 1024
+
+
+def available_formats() -> List[str]:
+    """Media types that can be produced, in order of preference for ``*/*``."""
+
+    formats = [JSON, COLUMNAR]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    return formats
+
+
+def available_encodings() -> List[str]:
+    """Content codings that can be produced, best compression first."""
+
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate(accept: str, accept_encoding: str) -> Tuple[str, Optional[str]]:
+    """Pick the media type and content coding from the request headers."""
+
+    media_type = parse_accept_header(accept, MIMEAccept).best_match(available_formats(), default=JSON)
+    encoding = parse_accept_header(accept_encoding).best_match(available_encodings(), default=None)
+    return media_type, encoding
+
+
+def pack_histogram(distribution: Mapping[int, int]) -> Dict[str, Any]:
+    """Pack a ``{seats: count}`` histogram as ``{"offset", "counts"}``."""
+
+    if not distribution:
+        return {"offset": 0, "counts": []}
+    low, high = min(distribution), max(distribution)
+    return {"offset": low, "counts": [distribution.get(value, 0) for value in range(low, high + 1)]}
+
+
+def serialize(body: Mapping[str, Any], media_type: str) -> bytes:
+    """Serialise ``body`` in one of the :func:`available_formats`."""
+
+    if media_type == COLUMNAR:
+        return _to_columnar(body)
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Encoding msgpack requires the optional 'msgpack' dependency")
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def compress(payload: bytes, encoding: Optional[str]) -> bytes:
+    """Apply the ``encoding`` content coding (``None`` leaves it untouched)."""
+
+    if encoding == "br":
+        return brotli.compress(payload, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(payload, compresslevel=5)
+    return payload
+
+
+def encode(
+    body: Mapping[str, Any],
+    accept: str = "",
+    accept_encoding: str = "",
+    min_size: int = MIN_COMPRESS_SIZE,
+) -> Tuple[bytes, Dict[str, str]]:
+    """Negotiate, serialise and compress ``body``; return payload and headers."""
+
+    media_type, encoding = negotiate(accept, accept_encoding)
+    payload = serialize(body, media_type)
+    headers = {"Content-Type": media_type, "Vary": "Accept, Accept-Encoding"}
+    if encoding is not None and len(payload) >= min_size:
+        payload = compress(payload, encoding)
+        headers["Content-Encoding"] = encoding
+    return payload, headers
+
+
+def _to_columnar(body: Mapping[str, Any]) -> bytes:
+    header = dict(body)
+    column = array("i")
+    distributions = body.get("distributions")
+    if distributions:
+        packed = {}
+        for name, histogram in distributions.items():
+            counts = histogram["counts"]
+            packed[name] = {"offset": histogram["offset"], "start": len(column), "length": len(counts)}
+            column.extend(counts)
+        header["distributions"] = packed
+    if sys.byteorder != "little":  # pragma: no cover - big-endian hosts
+        column.byteswap()
+
+    encoded = json.dumps(header, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 4)
+    return COLUMNAR_MAGIC + struct.pack("<I", len(encoded)) + encoded + column.tobytes()
+
+
+__all__ = [
+    "COLUMNAR",
+    "JSON",
+    "MSGPACK",
+    "available_encodings",
+    "available_formats",
+    "compress",
+    "encode",
+    "negotiate",
+    "pack_histogram",
+    "serialize",
+]
@@ -588,6 +588,41 @@ function updateSummary() {
     document.getElementById('coalitionsCount').textContent = `${coalitionCount} coalizion${coalitionCount === 1 ? 'e' : 'i'}`;
 }
 
+const COLUMNAR_TYPE = 'application/x-electoral-columnar';
+
+/**
+ * Decode a columnar simulation payload (see response_encoding.py), as sent
+ * when a request asks for distributions with the columnar Accept type.
+ * Histogram counts become Int32Array views over the received buffer.
+ */
+function decodeColumnar(buffer) {
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'EMC1') {
+        throw new Error('Unsupported columnar payload');
+    }
+    const headerLength = new DataView(buffer).getUint32(4, true);
+    const body = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    const dataOffset = 8 + headerLength;
+
+    Object.values(body.distributions || {}).forEach(histogram => {
+        histogram.counts = new Int32Array(buffer, dataOffset + histogram.start * 4, histogram.length);
+        delete histogram.start;
+        delete histogram.length;
+    });
+    return body;
+}
+
+/**
+ * Parse a simulation response according to its negotiated content type
+ */
+async function parseSimulationResponse(response) {
+    const contentType = response.headers.get('Content-Type') || '';
+    if (contentType.startsWith(COLUMNAR_TYPE)) {
+        return decodeColumnar(await response.arrayBuffer());
+    }
+    return response.json();
+}
+
 /**
  * Run the simulation
  */
@@ -645,7 +680,9 @@ async function runSimulation() {
             body: JSON.stringify(requestData)
         });
 
-        const result = await response.json();
+        // The UI does not request distributions, so plain JSON is the most
+        // compact answer; parseSimulationResponse also handles columnar bodies.
+        const result = await parseSimulationResponse(response);
 
         if (result.success) {
             displayResults(result);
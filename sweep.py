@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Sweep the proportional/majoritarian split and the chamber size in one pass.
+
+Studying how seats respond to ``proportional_coefficient`` (and to the number of
+seats) used to require one :class:`MontecarloElectoral` per grid point.  The
+sweep engine shares the work across the whole grid instead:
+
+* the largest-remainder allocation is computed once per distinct proportional
+  seat total, since it does not depend on the random draws;
+* the majoritarian seats of every grid point come from a single sequence of
+  draws per iteration.  The first ``m`` seats of a multinomial sequence are a
+  ``Multinomial(m, w)`` sample, so snapshotting the running counts at every
+  majoritarian total on the grid yields valid – and positively correlated, which
+  makes the curve smoother – samples for all of them.
+
+Every iteration therefore costs the draws of the largest majoritarian tier plus
+one ``K``-entry snapshot per distinct tier, while the histograms take
+``K × (m + 1)`` cells per tier ``m``.  :class:`SweepGrid` exposes these sizes so
+that callers can budget a sweep before running it.
+"""
+
+from __future__ import annotations
+
+import random
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from Electoral_Montecarlo import ElectionData, largest_remainder
+
+
+@dataclass
+class SweepPoint:
+    """Expected seats and predictive intervals at one point of the grid."""
+
+    seats: int
+    proportional_coefficient: float
+    majoritarian_coefficient: float
+    proportional_seats: int
+    majoritarian_seats: int
+    expected: Dict[str, float] = field(default_factory=dict)
+    intervals: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "seats": self.seats,
+            "proportionalCoefficient": self.proportional_coefficient,
+            "majoritarianCoefficient": self.majoritarian_coefficient,
+            "proportionalSeats": self.proportional_seats,
+            "majoritarianSeats": self.majoritarian_seats,
+            "expected": self.expected,
+            "intervals": {party: list(bounds) for party, bounds in self.intervals.items()},
+        }
+
+
+@dataclass(frozen=True)
+class SweepGrid:
+    """Layout of a sweep: ``(seats, alpha, beta, proportional, majoritarian)`` points."""
+
+    points: Tuple[Tuple[int, float, float, int, int], ...]
+    parties: int
+
+    @property
+    def tiers(self) -> List[int]:
+        """Distinct majoritarian seat totals, in increasing order."""
+
+        return sorted({point[4] for point in self.points})
+
+    @property
+    def histogram_cells(self) -> int:
+        """Number of histogram counters kept while sweeping."""
+
+        return self.parties * sum(tier + 1 for tier in self.tiers)
+
+    def iteration_units(self) -> int:
+        """Work of one iteration: the largest tier's draws plus every snapshot."""
+
+        tiers = self.tiers
+        return tiers[-1] + len(tiers) * self.parties
+
+    def fixed_units(self) -> int:
+        """Work independent of the iterations: allocations and interval scans."""
+
+        proportional_totals = len({point[3] for point in self.points})
+        scans = sum(point[4] + 1 for point in self.points)
+        return self.parties * (proportional_totals + scans)
+
+
+def build_grid(
+    proportional_coefficients: Sequence[float],
+    seats: Sequence[int],
+    coverage: float,
+    parties: int,
+) -> SweepGrid:
+    """Validate a sweep grid and lay out its points (no simulation involved)."""
+
+    seat_grid = [int(value) for value in seats]
+    if not seat_grid or not proportional_coefficients:
+        raise ValueError("The sweep grid must contain at least one point")
+    if any(value <= 0 for value in seat_grid):
+        raise ValueError("The total number of seats must be strictly positive")
+    if not 0.0 <= coverage <= 1.0:
+        raise ValueError("The coverage must lie in [0, 1]")
+    if any(not 0.0 <= float(alpha) <= coverage + 1e-12 for alpha in proportional_coefficients):
+        raise ValueError("Every proportional coefficient must lie in [0, coverage]")
+
+    points = []
+    for total_seats in seat_grid:
+        for alpha in proportional_coefficients:
+            alpha = float(alpha)
+            beta = max(coverage - alpha, 0.0)
+            points.append(
+                (total_seats, alpha, beta, int(round(total_seats * alpha)), int(round(total_seats * beta)))
+            )
+    return SweepGrid(points=tuple(points), parties=parties)
+
+
+def _interval(histogram: Sequence[int], total: int, level: float) -> Tuple[int, int]:
+    """Central ``level`` interval of a histogram indexed by seat count."""
+
+    tail = (1.0 - level) / 2.0
+    lower_target, upper_target = tail * total, (1.0 - tail) * total
+    lower = upper = None
+    running = 0
+    for value, count in enumerate(histogram):
+        running += count
+        if lower is None and running >= lower_target - 1e-9:
+            lower = value
+        if running >= upper_target - 1e-9:
+            upper = value
+            break
+    return (lower or 0, upper if upper is not None else len(histogram) - 1)
+
+
+def run_sweep(
+    data: ElectionData,
+    proportional_coefficients: Sequence[float],
+    seats: Optional[Sequence[int]] = None,
+    iterations: int = 1_000,
+    seed: Optional[int] = None,
+    rng: Optional[random.Random] = None,
+    coverage: Optional[float] = None,
+    level: float = 0.9,
+) -> List[SweepPoint]:
+    """Simulate every ``(seats, proportional coefficient)`` pair of the grid.
+
+    Parameters
+    ----------
+    data:
+        Scenario providing the parties and their shares.
+    proportional_coefficients:
+        Values of ``proportional_coefficient`` to evaluate.
+    seats:
+        Chamber sizes to evaluate (defaults to ``data.seats``).
+    coverage:
+        Fraction of the chamber elected by either tier; the majoritarian
+        coefficient of each point is ``coverage`` minus its proportional one.
+        Defaults to the scenario's own ``proportional + majoritarian`` total.
+    level:
+        Nominal probability of the reported central intervals.
+    """
+
+    if iterations <= 0:
+        raise ValueError("The number of iterations must be strictly positive")
+    if not 0.0 < level < 1.0:
+        raise ValueError("The interval level must lie in (0, 1)")
+    if data.regions is not None:
+        raise ValueError("Regional seat counts are fixed; sweeps need a national proportional tier")
+
+    if coverage is None:
+        coverage = data.proportional_coefficient + data.majoritarian_coefficient
+    grid = build_grid(proportional_coefficients, seats or [data.seats], coverage, len(data.parties))
+
+    weights = data.majoritarian_shares if data.majoritarian_shares else data.proportional_shares
+    cumulative = list(accumulate(weights))
+    weight_total = cumulative[-1]
+    if weight_total <= 0.0:
+        raise ValueError("Weights must sum to a positive value")
+    generator = random.Random(seed) if seed is not None else (rng or random.Random())
+
+    # The deterministic proportional tier of every point.
+    proportional: Dict[int, List[int]] = {}
+    for point in grid.points:
+        if point[3] not in proportional:
+            proportional[point[3]] = largest_remainder(data.proportional_shares, point[3])
+
+    # Majoritarian tier: one sequence of draws per iteration, snapshotted at
+    # every distinct total.  Histograms are indexed by the majoritarian seats.
+    party_count = len(data.parties)
+    checkpoints = grid.tiers
+    longest = checkpoints[-1]
+    histograms = {m: [[0] * (m + 1) for _ in range(party_count)] for m in checkpoints}
+    totals = {m: [0] * party_count for m in checkpoints}
+    last = len(cumulative) - 1
+
+    for _ in range(iterations):
+        counts = [0] * party_count
+        position = 0
+        for drawn in range(longest + 1):
+            if drawn == checkpoints[position]:
+                histogram, total = histograms[drawn], totals[drawn]
+                for index, value in enumerate(counts):
+                    histogram[index][value] += 1
+                    total[index] += value
+                position += 1
+                if position == len(checkpoints):
+                    break
+            winner = bisect_left(cumulative, generator.random() * weight_total)
+            counts[min(winner, last)] += 1
+
+    points = []
+    for total_seats, alpha, beta, n_prop, n_maj in grid.points:
+        base = proportional[n_prop]
+        point = SweepPoint(
+            seats=total_seats,
+            proportional_coefficient=alpha,
+            majoritarian_coefficient=beta,
+            proportional_seats=n_prop,
+            majoritarian_seats=n_maj,
+        )
+        for index, party in enumerate(data.parties):
+            low, high = _interval(histograms[n_maj][index], iterations, level)
+            point.expected[party] = base[index] + totals[n_maj][index] / iterations
+            point.intervals[party] = (base[index] + low, base[index] + high)
+        points.append(point)
+    return points
+
+
+__all__ = ["SweepGrid", "SweepPoint", "build_grid", "run_sweep"]
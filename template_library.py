@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""In-memory index and precomputed results for the ``Partiti`` templates.
+
+Every UI session starts by loading one of the JSON templates and simulating it
+with the default settings, which makes that the most expensive and the most
+repeated request served by the API.  :class:`TemplateLibrary` keeps an index of
+the templates in memory (so listing them does not touch the filesystem) and
+warms up their default simulations in a background thread.  The results are
+persisted in a small on-disk index keyed by the SHA-256 of the template content,
+which lets several server workers – and successive restarts – share the work.
+Reads and writes of the index are serialised across workers by a lock file next
+to it; simulations run outside the lock, so one worker warming up a template
+never blocks another serving a different one.  Storing a new result for a file
+prunes the results of its previous contents.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+#: Callback turning a template (plus the default settings) into the fingerprint
+#: of the equivalent simulation request and its response body.
+TemplateSimulator = Callable[[Mapping[str, Any], Mapping[str, Any]], Tuple[str, Dict[str, Any]]]
+
+
+@dataclass
+class TemplateEntry:
+    """Metadata and cached default simulation of a single template file."""
+
+    filename: str
+    content_hash: str
+    mtime_ns: int
+    size: int
+    fingerprint: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.result is not None or self.error is not None
+
+
+class TemplateLibrary:
+    """Index of the template directory with warmed-up default simulations.
+
+    Parameters
+    ----------
+    directory:
+        Folder containing the ``*.json`` templates.
+    index_path:
+        Location of the shared on-disk results index.
+    simulate:
+        Callback computing ``(fingerprint, body)`` for a template under the
+        given ``settings``.  It may raise :class:`ValueError` for templates that
+        cannot be simulated, in which case the error message is cached instead.
+    settings:
+        Default simulation settings; changing them invalidates the disk index.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        index_path: str,
+        simulate: TemplateSimulator,
+        settings: Mapping[str, Any],
+    ) -> None:
+        self.directory = Path(directory)
+        self.index_path = Path(index_path)
+        self.settings = dict(settings)
+        self._simulate = simulate
+        self._lock = threading.Lock()
+        self._entries: Dict[str, TemplateEntry] = {}
+        self._by_fingerprint: Dict[str, Dict[str, Any]] = {}
+        self._etag = ""
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    @property
+    def etag(self) -> str:
+        """Strong validator of the current template listing."""
+
+        return self._etag
+
+    def templates(self) -> List[str]:
+        """Return the template filenames known to the in-memory index."""
+
+        with self._lock:
+            return sorted(self._entries)
+
+    def entry(self, filename: str) -> Optional[TemplateEntry]:
+        """Return the index entry for ``filename``, revalidating it on disk.
+
+        A cheap ``stat`` detects edited or removed files; changed templates are
+        re-hashed and their cached result is dropped so that it is recomputed.
+        """
+
+        path = self.directory / filename
+        try:
+            stat = path.stat()
+        except OSError:
+            with self._lock:
+                self._drop(filename)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                return entry
+        return self._index_file(filename)
+
+    def cached_result(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the precomputed body matching a simulation ``fingerprint``."""
+
+        with self._lock:
+            return self._by_fingerprint.get(fingerprint)
+
+    def result(self, filename: str) -> Optional[TemplateEntry]:
+        """Return the entry for ``filename`` with its default result computed."""
+
+        entry = self.entry(filename)
+        if entry is None or entry.ready:
+            return entry
+        self._compute(entry)
+        return entry
+
+    def refresh(self) -> None:
+        """Rescan the directory, updating the index and its ETag."""
+
+        names = set()
+        if self.directory.is_dir():
+            names = {name for name in os.listdir(self.directory) if name.endswith(".json")}
+
+        with self._lock:
+            for stale in set(self._entries) - names:
+                self._drop(stale)
+        for name in sorted(names):
+            self.entry(name)
+        self._update_etag()
+
+    def warm_up(self) -> None:
+        """Compute (or load from disk) the default result of every template."""
+
+        self.refresh()
+        with self._lock:
+            pending = [entry for entry in self._entries.values() if not entry.ready]
+        for entry in pending:
+            if self._stop.is_set():
+                return
+            self._compute(entry)
+
+    def start(self, interval: float = 60.0) -> threading.Thread:
+        """Warm up in a daemon thread, rescanning every ``interval`` seconds.
+
+        A non-positive ``interval`` performs a single warm-up pass.
+        """
+
+        def _run() -> None:
+            while True:
+                try:
+                    self.warm_up()
+                except Exception:  # pragma: no cover - keep the server alive
+                    pass
+                if interval <= 0 or self._stop.wait(interval):
+                    return
+
+        self._thread = threading.Thread(target=_run, name="template-warmup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        """Ask the warm-up thread to terminate after its current step."""
+
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+    def _index_file(self, filename: str) -> Optional[TemplateEntry]:
+        path = self.directory / filename
+        try:
+            stat = path.stat()
+            content = path.read_bytes()
+        except OSError:
+            with self._lock:
+                self._drop(filename)
+            return None
+
+        entry = TemplateEntry(
+            filename=filename,
+            content_hash=hashlib.sha256(content).hexdigest(),
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+        )
+        with self._lock:
+            previous = self._entries.get(filename)
+            if previous is not None and previous.content_hash == entry.content_hash:
+                previous.mtime_ns, previous.size = entry.mtime_ns, entry.size
+                return previous
+            self._drop(filename)
+            self._entries[filename] = entry
+        self._update_etag()
+        return entry
+
+    def _drop(self, filename: str) -> None:
+        # Callers must hold ``self._lock``.
+        entry = self._entries.pop(filename, None)
+        if entry is not None and entry.fingerprint is not None:
+            self._by_fingerprint.pop(entry.fingerprint, None)
+
+    def _update_etag(self) -> None:
+        with self._lock:
+            digest = hashlib.sha256()
+            for name in sorted(self._entries):
+                digest.update(name.encode("utf-8"))
+                digest.update(self._entries[name].content_hash.encode("ascii"))
+            self._etag = digest.hexdigest()[:32]
+
+    def _compute(self, entry: TemplateEntry) -> None:
+        # Re-check the disk index right before simulating, so that a template
+        # finished by another worker in the meantime is reused.  The lock only
+        # covers the index accesses, not the simulation itself.
+        with self._disk_lock():
+            cached = self._load_disk_index().get(entry.content_hash)
+        if cached is not None and cached.get("settings") == self.settings:
+            fingerprint, result, error = cached.get("fingerprint"), cached.get("result"), cached.get("error")
+        else:
+            fingerprint, result, error = None, None, None
+            try:
+                template = json.loads((self.directory / entry.filename).read_text(encoding="utf-8"))
+                fingerprint, result = self._simulate(template, self.settings)
+            except (OSError, ValueError) as exc:
+                error = str(exc)
+            with self._disk_lock():
+                self._store_disk_entry(entry.content_hash, {
+                    "filename": entry.filename,
+                    "settings": self.settings,
+                    "fingerprint": fingerprint,
+                    "result": result,
+                    "error": error,
+                })
+
+        with self._lock:
+            entry.fingerprint, entry.result, entry.error = fingerprint, result, error
+            if fingerprint is not None and result is not None and self._entries.get(entry.filename) is entry:
+                self._by_fingerprint[fingerprint] = result
+
+    @contextmanager
+    def _disk_lock(self) -> Iterator[None]:
+        """Exclusive lock on the disk index shared by every worker process."""
+
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            handle = open(self.index_path.with_name(self.index_path.name + ".lock"), "a")
+        except OSError:  # pragma: no cover - a read-only tree only loses the cache
+            yield
+            return
+        with handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _load_disk_index(self) -> Dict[str, Any]:
+        try:
+            payload = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return payload if isinstance(payload, dict) else {}
+
+    def _store_disk_entry(self, content_hash: str, record: Dict[str, Any]) -> None:
+        # Callers hold ``_disk_lock``: re-read before writing so that entries
+        # stored by other workers are kept, drop the results of the file's
+        # previous contents, then replace the file atomically.
+        index = {
+            key: value
+            for key, value in self._load_disk_index().items()
+            if not (isinstance(value, dict) and value.get("filename") == record["filename"])
+        }
+        index[content_hash] = record
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=self.index_path.parent, suffix=".tmp")
+            with os.fdopen(handle, "w", encoding="utf-8") as stream:
+                json.dump(index, stream)
+            os.replace(temporary, self.index_path)
+        except OSError:  # pragma: no cover - a read-only tree only loses the cache
+            pass
+
+
+__all__ = ["TemplateEntry", "TemplateLibrary"]
@@ -4,10 +4,28 @@ Created on Thu Nov 14 23:03:10 2019
 @author: Giulio
 """
 
+import array
+import copy
+import dataclasses
+import gzip
+import json
+import multiprocessing
+import os
 import pytest
 import numpy as np
 import random as rd
+import statistics
+import struct
+import subprocess
+import sys
+import threading
 import Electoral_Montecarlo
+import admission
+import backtesting
+import loadtest
+import response_encoding
+import sweep
+import template_library
 from hypothesis import given
 import hypothesis.strategies as st
 from hypothesis import settings
@@ -179,7 +197,981 @@ def test_complete_simulation():
 	s         = m.complete_simulation()
 	for i in s.keys():
 		#I want to proof that the function works because it converges to a value very close to the real one.
-		assert  np.abs(s[i]-Seats2018[i])<(m.Ndeputies*0.05) 
-	
-	
-	
+		assert  np.abs(s[i]-Seats2018[i])<(m.Ndeputies*0.05)
+
+
+def _scenario_data(seats=200):
+	"""
+	Small four-party scenario shared by the tests of the compiled simulation.
+
+	Returns
+	-------
+	ElectionData of the scenario.
+
+	"""
+	return Electoral_Montecarlo.ElectionData(
+		name='test',
+		parties=['A', 'B', 'C', 'D'],
+		proportional_shares=[0.4, 0.3, 0.2, 0.1],
+		proportional_coefficient=0.5,
+		majoritarian_coefficient=0.5,
+		seats=seats,
+	)
+
+
+def test_seat_covariance_uneven_batches():
+	"""
+	This test feeds SeatCovariance with batches of uneven (and empty) sizes and
+	verifies that the merged covariance and correlation match the two-pass
+	estimates of the statistics module.
+
+	Returns
+	-------
+	None.
+
+	"""
+	generator = rd.Random(7)
+	draws = [[generator.randint(0, 50), generator.randint(0, 50), generator.randint(0, 50)] for _ in range(60)]
+	accumulator = Electoral_Montecarlo.SeatCovariance(['A', 'B', 'C'])
+	start = 0
+	for size in [1, 7, 0, 30, 2, 20]:
+		accumulator.update(draws[start:start + size])
+		start += size
+	assert accumulator.count == len(draws)
+
+	covariance = accumulator.covariance()
+	correlation = accumulator.correlation()
+	columns = {party: [row[index] for row in draws] for index, party in enumerate(['A', 'B', 'C'])}
+	for first in columns:
+		for second in columns:
+			assert covariance[first][second] == pytest.approx(statistics.covariance(columns[first], columns[second]))
+			assert correlation[first][second] == pytest.approx(statistics.correlation(columns[first], columns[second]))
+
+
+def test_run_scenario_optional_accumulators():
+	"""
+	This test verifies that run_scenario only accumulates the covariance and
+	the histograms when asked to, and that doing so does not change the draws.
+
+	Returns
+	-------
+	None.
+
+	"""
+	scenario = Electoral_Montecarlo.compile_scenario(_scenario_data())
+	plain = Electoral_Montecarlo.run_scenario(scenario, 500, rd.Random(3))
+	assert plain.covariance is None and plain.distributions is None and plain.history is None
+
+	full = Electoral_Montecarlo.run_scenario(scenario, 500, rd.Random(3), covariance=True, distributions=True)
+	assert full.totals == plain.totals
+	assert full.covariance.count == 500
+	for index, party in enumerate(scenario.parties):
+		histogram = full.distributions[party]
+		assert sum(histogram.values()) == 500
+		assert sum(value * count for value, count in histogram.items()) == full.totals[index]
+
+
+def test_complete_simulation_without_history():
+	"""
+	This test verifies that complete_simulation with keep_history=False keeps no
+	per-iteration draws but still fills the distributions and the covariance,
+	returning the same expected seats as a run keeping the history.
+
+	Returns
+	-------
+	None.
+
+	"""
+	data = _scenario_data()
+	results = []
+	for keep_history in [True, False]:
+		m = Electoral_Montecarlo.MontecarloElectoral(election='test')
+		m._set_data(
+			name=data.name,
+			parties=data.parties,
+			proportional_shares=data.proportional_shares,
+			proportional_coefficient=data.proportional_coefficient,
+			majoritarian_coefficient=data.majoritarian_coefficient,
+			seats=data.seats,
+		)
+		results.append(m.complete_simulation(iterations=300, seed=11, keep_history=keep_history))
+		assert m.covariance.count == 300
+		assert all(sum(histogram.values()) == 300 for histogram in m.distributions.values())
+		if keep_history:
+			assert all(len(draws) == 300 for draws in m.allResults.values())
+		else:
+			assert m.allResults == {}
+	assert results[0] == results[1]
+
+
+SampleDistribution = {3: 2, 5: 5, 9: 3}
+
+
+def test_crps():
+	"""
+	This test checks the exact CRPS of a small empirical distribution against
+	hand-computed values, for an observation inside and one below its support.
+
+	Returns
+	-------
+	None.
+
+	"""
+	assert backtesting.crps(SampleDistribution, 6.5) == pytest.approx(1.04)
+	assert backtesting.crps(SampleDistribution, 0) == pytest.approx(4.64)
+	assert backtesting.crps({4: 1}, 4) == pytest.approx(0.0)
+
+
+def test_pit_and_quantile():
+	"""
+	This test verifies the mid probability integral transform and the quantiles
+	of a small empirical distribution.
+
+	Returns
+	-------
+	None.
+
+	"""
+	assert backtesting.pit(SampleDistribution, 5) == pytest.approx(0.45)
+	assert backtesting.pit(SampleDistribution, 6.5) == pytest.approx(0.7)
+	assert backtesting.pit(SampleDistribution, 0) == 0.0
+	assert backtesting.pit(SampleDistribution, 10) == 1.0
+
+	assert backtesting.quantile(SampleDistribution, 0.2) == 3
+	assert backtesting.quantile(SampleDistribution, 0.21) == 5
+	assert backtesting.quantile(SampleDistribution, 0.7) == 5
+	assert backtesting.quantile(SampleDistribution, 1.0) == 9
+
+
+def test_log_score():
+	"""
+	This test verifies the add-half smoothed negative log-probability, which
+	must stay finite for seat counts never drawn.
+
+	Returns
+	-------
+	None.
+
+	"""
+	assert backtesting.log_score(SampleDistribution, 5, 10) == pytest.approx(-np.log(5.5 / 15.5))
+	assert backtesting.log_score(SampleDistribution, 4, 10) == pytest.approx(-np.log(0.5 / 15.5))
+	assert backtesting.log_score(SampleDistribution, 5, 10) < backtesting.log_score(SampleDistribution, 3, 10)
+
+
+def test_load_catalog(tmp_path):
+	"""
+	This test verifies that catalogs are read both as plain lists and as
+	{"cases": [...]} objects, with paths resolved against the catalog folder
+	and names defaulting to the election file stem.
+
+	Returns
+	-------
+	None.
+
+	"""
+	entries = [
+		{'name': 'First', 'election': 'first.txt', 'real': 'real/first.txt'},
+		{'election': 'second.txt', 'real': 'second_real.txt'},
+	]
+	(tmp_path / 'list.json').write_text(json.dumps(entries), encoding='utf-8')
+	(tmp_path / 'object.json').write_text(json.dumps({'cases': entries}), encoding='utf-8')
+
+	for catalog in ['list.json', 'object.json']:
+		cases = backtesting.load_catalog(str(tmp_path / catalog))
+		assert [case.name for case in cases] == ['First', 'second']
+		assert cases[0].election_path == str(tmp_path / 'first.txt')
+		assert cases[0].real_path == str(tmp_path / 'real' / 'first.txt')
+
+
+def test_run_backtest_in_process():
+	"""
+	This test backtests the bundled catalog in-process and verifies that every
+	party is scored and that a seeded run is reproducible.
+
+	Returns
+	-------
+	None.
+
+	"""
+	catalog = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Elections', 'backtest_catalog.json')
+	cases = backtesting.load_catalog(catalog)
+	report = backtesting.run_backtest(cases, iterations=300, seed=1, workers=1)
+	assert [case.error for case in report.cases] == [None] * len(cases)
+
+	summary = report.summary()
+	assert summary['elections'] == len(cases) and summary['failed'] == 0
+	assert summary['parties'] > 0
+	for score in report.scores():
+		assert score.crps >= 0.0 and 0.0 <= score.pit <= 1.0
+		assert score.covered == (score.interval[0] <= score.real <= score.interval[1])
+	assert backtesting.run_backtest(cases, iterations=300, seed=1, workers=1).summary() == summary
+
+
+def _decode_columnar(payload):
+	"""
+	Minimal reader of the columnar layout, mirroring decodeColumnar in app.js.
+
+	Returns
+	-------
+	Header length, decoded header and the list of histogram counts per name.
+
+	"""
+	assert payload[:4] == response_encoding.COLUMNAR_MAGIC
+	header_length = struct.unpack('<I', payload[4:8])[0]
+	header = json.loads(payload[8:8 + header_length].decode('utf-8'))
+	column = array.array('i')
+	column.frombytes(payload[8 + header_length:])
+	counts = {
+		name: list(column[histogram['start']:histogram['start'] + histogram['length']])
+		for name, histogram in header.get('distributions', {}).items()
+	}
+	return header_length, header, counts
+
+
+def test_columnar_round_trip():
+	"""
+	This test encodes bodies in the columnar layout and verifies that the data
+	block starts on a 4-byte boundary whatever the header length, and that the
+	start/length offsets give back every histogram.
+
+	Returns
+	-------
+	None.
+
+	"""
+	distributions = {
+		'A': response_encoding.pack_histogram({10: 3, 12: 1}),
+		'Bè': response_encoding.pack_histogram({0: 7}),
+		'C': response_encoding.pack_histogram({}),
+	}
+	for padding in range(4):
+		body = {'success': True, 'name': 'x' * padding, 'distributions': distributions}
+		payload = response_encoding.serialize(body, response_encoding.COLUMNAR)
+		header_length, header, counts = _decode_columnar(payload)
+		assert (8 + header_length) % 4 == 0
+		assert (len(payload) - 8 - header_length) % 4 == 0
+		assert header['name'] == 'x' * padding
+		assert counts == {name: histogram['counts'] for name, histogram in distributions.items()}
+		assert [header['distributions'][name]['offset'] for name in distributions] == [10, 0, 0]
+
+	header_length, header, counts = _decode_columnar(response_encoding.serialize({'success': True}, response_encoding.COLUMNAR))
+	assert header == {'success': True} and counts == {}
+
+
+def test_negotiate():
+	"""
+	This test verifies the media type and content coding picked from the
+	Accept and Accept-Encoding headers, including the JSON fallback.
+
+	Returns
+	-------
+	None.
+
+	"""
+	columnar = response_encoding.COLUMNAR
+	assert response_encoding.negotiate('', '') == (response_encoding.JSON, None)
+	assert response_encoding.negotiate('text/html', 'identity') == (response_encoding.JSON, None)
+	assert response_encoding.negotiate(columnar + ', application/json;q=0.9', 'gzip')[0] == columnar
+	assert response_encoding.negotiate('application/json, ' + columnar + ';q=0.5', '')[0] == response_encoding.JSON
+	assert response_encoding.negotiate('*/*', 'gzip') == (response_encoding.JSON, 'gzip')
+	expected = 'br' if 'br' in response_encoding.available_encodings() else 'gzip'
+	assert response_encoding.negotiate('', 'gzip;q=0.5, br') == (response_encoding.JSON, expected)
+
+
+def test_encode():
+	"""
+	This test verifies that encode only compresses payloads above the size
+	threshold, sets the negotiated headers and that the payload decodes back
+	to the original body.
+
+	Returns
+	-------
+	None.
+
+	"""
+	small = {'success': True}
+	payload, headers = response_encoding.encode(small, 'application/json', 'gzip')
+	assert json.loads(payload) == small
+	assert headers == {'Content-Type': response_encoding.JSON, 'Vary': 'Accept, Accept-Encoding'}
+
+	large = {'success': True, 'distributions': {'A': response_encoding.pack_histogram({value: value for value in range(1000)})}}
+	payload, headers = response_encoding.encode(large, '', 'gzip', min_size=1024)
+	assert headers['Content-Encoding'] == 'gzip'
+	assert json.loads(gzip.decompress(payload)) == large
+
+	payload, headers = response_encoding.encode(large, response_encoding.COLUMNAR, '')
+	assert 'Content-Encoding' not in headers and headers['Content-Type'] == response_encoding.COLUMNAR
+	assert _decode_columnar(payload)[2] == {'A': large['distributions']['A']['counts']}
+
+
+def test_sweep_interval_bounds():
+	"""
+	This test verifies the central intervals computed from seat histograms,
+	including targets falling exactly on a cumulative count and degenerate
+	histograms.
+
+	Returns
+	-------
+	None.
+
+	"""
+	assert sweep._interval([0, 2, 5, 0, 3], 10, 0.5) == (2, 4)
+	assert sweep._interval([0, 2, 5, 0, 3], 10, 0.9) == (1, 4)
+	assert sweep._interval([1] * 10, 10, 0.8) == (0, 8)
+	assert sweep._interval([0, 0, 7], 7, 0.9) == (2, 2)
+
+
+def test_sweep_single_point_matches_complete_simulation():
+	"""
+	This test verifies that a one-point sweep agrees in distribution with
+	complete_simulation on the same scenario: same proportional seats, close
+	expected seats and intervals.
+
+	Returns
+	-------
+	None.
+
+	"""
+	data = _scenario_data()
+	point = sweep.run_sweep(data, [0.5], iterations=4000, seed=1)[0]
+	assert (point.seats, point.proportional_seats, point.majoritarian_seats) == (200, 100, 100)
+
+	m = Electoral_Montecarlo.MontecarloElectoral(election='test')
+	m._set_data(
+		name=data.name,
+		parties=data.parties,
+		proportional_shares=data.proportional_shares,
+		proportional_coefficient=data.proportional_coefficient,
+		majoritarian_coefficient=data.majoritarian_coefficient,
+		seats=data.seats,
+	)
+	m.complete_simulation(iterations=4000, seed=2, keep_history=False)
+	for party in data.parties:
+		histogram = m.distributions[party]
+		expected = sum(value * count for value, count in histogram.items()) / 4000
+		assert point.expected[party] == pytest.approx(expected, abs=0.5)
+		low = backtesting.quantile(histogram, 0.05)
+		high = backtesting.quantile(histogram, 0.95)
+		assert abs(point.intervals[party][0] - low) <= 2 and abs(point.intervals[party][1] - high) <= 2
+
+
+def test_sweep_seeded_reproducible():
+	"""
+	This test verifies that a seeded sweep over several chamber sizes and
+	coefficients is reproducible, and that the grid layout is reported.
+
+	Returns
+	-------
+	None.
+
+	"""
+	data = _scenario_data()
+	runs = [
+		[point.to_dict() for point in sweep.run_sweep(data, [0.0, 0.25, 1.0], seats=[50, 200], iterations=200, seed=seed)]
+		for seed in [5, 5, 6]
+	]
+	assert runs[0] == runs[1]
+	assert runs[0] != runs[2]
+	assert [(point['seats'], point['majoritarianSeats']) for point in runs[0]] == [
+		(50, 50), (50, 38), (50, 0), (200, 200), (200, 150), (200, 0)
+	]
+
+	grid = sweep.build_grid([0.0, 0.25, 1.0], [50, 200], 1.0, 4)
+	assert grid.tiers == [0, 38, 50, 150, 200]
+	assert grid.histogram_cells == 4 * (1 + 39 + 51 + 151 + 201)
+	assert grid.iteration_units() == 200 + 5 * 4
+
+
+def test_sweep_endpoint_rejects_out_of_range_grid(tmp_path, monkeypatch):
+	"""
+	This test verifies that /api/sweep answers 400 to proportional
+	percentages outside [0, coverage] and 422 to grids above the point cap.
+
+	Returns
+	-------
+	None.
+
+	"""
+	monkeypatch.setenv('TEMPLATE_WARMUP', '0')
+	monkeypatch.setenv('SIMULATE_COST_RATE', '10000000')
+	monkeypatch.setenv('SIMULATE_STATE_PATH', str(tmp_path / 'admission.json'))
+	import app
+
+	client = app.app.test_client()
+	payload = {'parties': [{'name': 'A', 'share': 60}, {'name': 'B', 'share': 40}], 'iterations': 100}
+	for grid in [[-10, 50], [50, 120]]:
+		response = client.post('/api/sweep', json=dict(payload, proportionalGrid=grid))
+		assert response.status_code == 400
+		assert 'proportional coefficient' in response.get_json()['error']
+
+	response = client.post('/api/sweep', json=dict(payload, proportionalGrid=[50]))
+	assert response.status_code == 200
+	assert len(response.get_json()['points']) == 1
+
+	seats = list(range(1, app.SWEEP_MAX_POINTS + 2))
+	response = client.post('/api/sweep', json=dict(payload, proportionalGrid=[50], seatsGrid=seats))
+	assert response.status_code == 422
+	assert response.get_json()['maxPoints'] == app.SWEEP_MAX_POINTS
+
+
+RegionalCsv = """region,seats,B,A,C
+North,30,0.30,0.50,0.20
+South,20,0.45,0.25,0.30
+"""
+
+
+def test_regional_table_reorders_columns():
+	"""
+	This test verifies that a regional table whose party columns are in a
+	different order than the election is reordered to match it, both directly
+	and when attached to ElectionData.
+
+	Returns
+	-------
+	None.
+
+	"""
+	table = Electoral_Montecarlo.RegionalTable.parse(RegionalCsv)
+	reordered = table.reordered(['A', 'B', 'C'])
+	assert reordered.parties == ('A', 'B', 'C')
+	assert reordered.shares == ((0.50, 0.30, 0.20), (0.25, 0.45, 0.30))
+	assert reordered.seats == (30, 20) and reordered.regions == ('North', 'South')
+	assert table.reordered(['B', 'A', 'C']) is table
+
+	data = Electoral_Montecarlo.ElectionData(
+		name='regional',
+		parties=['A', 'B', 'C'],
+		proportional_shares=[0.4, 0.36, 0.24],
+		proportional_coefficient=0.5,
+		majoritarian_coefficient=0.5,
+		seats=100,
+		regions=table,
+	)
+	assert data.regions == reordered
+	proportional = Electoral_Montecarlo.compile_scenario(data).proportional_seats
+	assert list(proportional) == reordered.allocate() == [20, 18, 12]
+
+
+def test_regional_table_rejects_inconsistent_tables():
+	"""
+	This test verifies the errors raised for a regional seat total different
+	from the proportional tier and for duplicate or unknown party columns.
+
+	Returns
+	-------
+	None.
+
+	"""
+	table = Electoral_Montecarlo.RegionalTable.parse(RegionalCsv)
+	arguments = dict(
+		name='regional',
+		parties=['A', 'B', 'C'],
+		proportional_shares=[0.4, 0.36, 0.24],
+		proportional_coefficient=0.5,
+		majoritarian_coefficient=0.5,
+	)
+	with pytest.raises(ValueError, match='regional seats sum to 50'):
+		Electoral_Montecarlo.ElectionData(seats=120, regions=table, **arguments)
+
+	with pytest.raises(ValueError, match='unique'):
+		Electoral_Montecarlo.RegionalTable.parse("region,seats,A,A,C\nNorth,30,0.3,0.5,0.2\n")
+
+	unknown = Electoral_Montecarlo.RegionalTable.parse(RegionalCsv.replace('C\n', 'D\n', 1))
+	with pytest.raises(ValueError, match='exactly the parties'):
+		Electoral_Montecarlo.ElectionData(seats=100, regions=unknown, **arguments)
+	with pytest.raises(ValueError, match='exactly the parties'):
+		table.reordered(['A', 'B'])
+
+
+def test_largest_remainder_batch_matches_rows():
+	"""
+	This test verifies that the batched largest-remainder allocation returns,
+	row by row, what largest_remainder returns for each row alone, including
+	ties and rows with zero seats.
+
+	Returns
+	-------
+	None.
+
+	"""
+	generator = rd.Random(3)
+	rows = [[generator.random() for _ in range(5)] for _ in range(40)]
+	rows = [[value / sum(row) for value in row] for row in rows]
+	rows += [[0.25, 0.25, 0.25, 0.25], [0.5, 0.5, 0.0, 0.0], [0.3, 0.3, 0.2, 0.1]]
+	rows = [row + [0.0] * (5 - len(row)) for row in rows]
+	totals = [generator.randint(0, 60) for _ in range(40)] + [7, 3, 0]
+
+	batch = Electoral_Montecarlo.largest_remainder_batch(rows, totals)
+	assert batch == [Electoral_Montecarlo.largest_remainder(row, total) for row, total in zip(rows, totals)]
+	assert [sum(allocation) for allocation in batch] == totals
+	for row, total, allocation in zip(rows, totals, batch):
+		assert all(int(np.floor(share * total)) <= seats <= int(np.floor(share * total)) + 1 for share, seats in zip(row, allocation))
+	with pytest.raises(ValueError):
+		Electoral_Montecarlo.largest_remainder_batch(rows, totals[:-1])
+
+
+def _template_library(tmp_path, calls, settings=None):
+	"""
+	TemplateLibrary over tmp_path/Partiti with a stub simulate callback that
+	records its calls and refuses templates without parties.
+
+	Returns
+	-------
+	The TemplateLibrary.
+
+	"""
+	def simulate(template, defaults):
+		calls.append(template)
+		if not template.get('parties'):
+			raise ValueError('At least one party is required')
+		return 'fp-' + template['parties'][0]['name'], {'success': True, 'first': template['parties'][0]['name']}
+
+	return template_library.TemplateLibrary(
+		directory=str(tmp_path / 'Partiti'),
+		index_path=str(tmp_path / 'cache' / 'index.json'),
+		simulate=simulate,
+		settings=settings or {'seats': 400},
+	)
+
+
+def _write_template(tmp_path, filename, first):
+	"""
+	Write a one-party template named after ``first``.
+
+	Returns
+	-------
+	None.
+
+	"""
+	folder = tmp_path / 'Partiti'
+	folder.mkdir(exist_ok=True)
+	(folder / filename).write_text(json.dumps({'parties': [{'name': first, 'share': 100}]}), encoding='utf-8')
+
+
+def test_template_library_edit_invalidates(tmp_path):
+	"""
+	This test verifies that editing a template changes the ETag, drops its
+	cached result and fingerprint, and prunes the old result from the disk
+	index.
+
+	Returns
+	-------
+	None.
+
+	"""
+	calls = []
+	_write_template(tmp_path, 'a.json', 'A')
+	library = _template_library(tmp_path, calls)
+	library.warm_up()
+	etag = library.etag
+	assert library.cached_result('fp-A') == {'success': True, 'first': 'A'}
+
+	_write_template(tmp_path, 'a.json', 'Alpha')
+	entry = library.result('a.json')
+	assert entry.result == {'success': True, 'first': 'Alpha'}
+	assert library.etag != etag
+	assert library.cached_result('fp-A') is None
+	assert library.cached_result('fp-Alpha') is not None
+	assert len(calls) == 2
+
+	index = json.loads((tmp_path / 'cache' / 'index.json').read_text(encoding='utf-8'))
+	assert list(index) == [entry.content_hash]
+
+
+def test_template_library_reuses_disk_index(tmp_path):
+	"""
+	This test verifies that a second library (e.g. another worker) reuses the
+	results stored on disk without simulating, unless the settings changed.
+
+	Returns
+	-------
+	None.
+
+	"""
+	calls = []
+	_write_template(tmp_path, 'a.json', 'A')
+	_write_template(tmp_path, 'b.json', 'B')
+	_template_library(tmp_path, calls).warm_up()
+	assert len(calls) == 2
+
+	second = _template_library(tmp_path, calls)
+	second.warm_up()
+	assert len(calls) == 2
+	assert second.result('b.json').result == {'success': True, 'first': 'B'}
+	assert second.cached_result('fp-A') is not None
+
+	_template_library(tmp_path, calls, settings={'seats': 200}).warm_up()
+	assert len(calls) == 4
+
+
+def test_template_library_caches_errors(tmp_path):
+	"""
+	This test verifies that templates which cannot be simulated, or parsed,
+	cache their error instead of being simulated again.
+
+	Returns
+	-------
+	None.
+
+	"""
+	calls = []
+	folder = tmp_path / 'Partiti'
+	folder.mkdir()
+	(folder / 'empty.json').write_text(json.dumps({'parties': []}), encoding='utf-8')
+	(folder / 'broken.json').write_text('{not json', encoding='utf-8')
+	library = _template_library(tmp_path, calls)
+	library.warm_up()
+	library.warm_up()
+
+	assert library.result('empty.json').error == 'At least one party is required'
+	assert library.result('broken.json').error is not None
+	assert library.result('broken.json').result is None
+	assert len(calls) == 1
+	assert library.result('missing.json') is None
+
+
+def test_parties_templates_etag(tmp_path, monkeypatch):
+	"""
+	This test verifies that /api/parties-templates answers 304 to a request
+	carrying its current ETag in If-None-Match.
+
+	Returns
+	-------
+	None.
+
+	"""
+	monkeypatch.setenv('TEMPLATE_WARMUP', '0')
+	monkeypatch.setenv('SIMULATE_COST_RATE', '10000000')
+	monkeypatch.setenv('SIMULATE_STATE_PATH', str(tmp_path / 'admission.json'))
+	import app
+
+	client = app.app.test_client()
+	response = client.get('/api/parties-templates')
+	assert response.status_code == 200 and response.headers['ETag']
+	response = client.get('/api/parties-templates', headers={'If-None-Match': response.headers['ETag']})
+	assert response.status_code == 304
+	assert client.get('/api/parties-templates', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_loadtest_percentile():
+	"""
+	This test verifies the linear-interpolated percentiles of the load-test
+	report, including single values and empty inputs.
+
+	Returns
+	-------
+	None.
+
+	"""
+	values = [1.0, 2.0, 3.0, 4.0, 5.0]
+	assert loadtest.percentile(values, 0) == 1.0
+	assert loadtest.percentile(values, 50) == 3.0
+	assert loadtest.percentile(values, 100) == 5.0
+	assert loadtest.percentile(values, 95) == pytest.approx(4.8)
+	assert loadtest.percentile([7.0], 99) == 7.0
+	assert np.isnan(loadtest.percentile([], 50))
+
+
+def test_loadtest_group_stats():
+	"""
+	This test verifies that the per-group statistics count every status code
+	separately and only treat 200 as a success.
+
+	Returns
+	-------
+	None.
+
+	"""
+	samples = [
+		loadtest.Sample('a', 0.1, 200),
+		loadtest.Sample('a', 0.2, 200),
+		loadtest.Sample('a', 0.3, 429),
+		loadtest.Sample('a', 0.4, 0),
+	]
+	stats = loadtest._group_stats(samples, 2.0)
+	assert stats['requests'] == 4 and stats['throughput'] == 2.0
+	assert stats['error_rate'] == 0.5
+	assert stats['statuses'] == {'0': 1, '200': 2, '429': 1}
+	assert stats['p50_ms'] == 250.0
+
+	summary = loadtest.Report(duration=2.0, samples=samples + [loadtest.Sample('b', 0.5, 503)]).summary()
+	assert list(summary['groups']) == ['all', 'a', 'b']
+	assert summary['groups']['b']['statuses'] == {'503': 1}
+	assert '429:1' in loadtest.format_report(summary)
+
+
+def test_loadtest_build_request_mix(tmp_path):
+	"""
+	This test verifies that the request mix keeps the largest parties of each
+	template, renormalises their shares to 99% and accepts templates given as
+	plain lists without shares.
+
+	Returns
+	-------
+	None.
+
+	"""
+	(tmp_path / 'a.json').write_text(json.dumps({'parties': [
+		{'name': 'Small', 'share': 5},
+		{'name': 'Big', 'share': 30},
+		{'name': 'Mid', 'share': 15},
+	]}), encoding='utf-8')
+	(tmp_path / 'b.json').write_text(json.dumps([{'party': 'X'}, {'party': 'Y'}]), encoding='utf-8')
+
+	mix = loadtest.build_request_mix(tmp_path, [100, 1000], [2, 8], seats=200)
+	assert [spec.label for spec in mix] == [
+		'a parties=2 iterations=100', 'a parties=2 iterations=1000',
+		'a parties=3 iterations=100', 'a parties=3 iterations=1000',
+		'b parties=2 iterations=100', 'b parties=2 iterations=1000',
+		'b parties=2 iterations=100', 'b parties=2 iterations=1000',
+	]
+	bodies = [json.loads(spec.payload) for spec in mix]
+	assert [party['name'] for party in bodies[0]['parties']] == ['Big', 'Mid']
+	assert [party['share'] for party in bodies[0]['parties']] == [66.0, 33.0]
+	assert [party['share'] for party in bodies[4]['parties']] == [49.5, 49.5]
+	assert all(body['seats'] == 200 and sum(party['share'] for party in body['parties']) == pytest.approx(99.0) for body in bodies)
+
+
+def test_cost_model():
+	"""
+	This test verifies the cost units (with and without the covariance term)
+	and the largest iteration count fitting a time budget.
+
+	Returns
+	-------
+	None.
+
+	"""
+	model = admission.CostModel(units_per_second=1000.0)
+	assert model.units(10, 20, 4) == 240.0
+	assert model.units(10, 20, 4, covariance=True) == 280.0
+	assert model.units(10, -5, 0) == 10.0
+	assert model.seconds(10, 20, 4) == pytest.approx(0.24)
+	assert model.max_iterations(1.0, 20, 4) == 41
+	assert model.max_iterations(1.0, 20, 4, covariance=True) == 35
+
+
+def test_admission_plan():
+	"""
+	This test verifies that over-budget requests are rejected with 422 and the
+	largest admissible iteration count, or downgraded when allowed, also for
+	work given directly in cost units.
+
+	Returns
+	-------
+	None.
+
+	"""
+	controller = admission.AdmissionController(
+		admission.CostModel(units_per_second=1000.0), max_request_seconds=1.0, min_iterations=10
+	)
+	assert controller.plan(10, 20, 4) == (10, pytest.approx(0.24))
+
+	with pytest.raises(admission.AdmissionError) as error:
+		controller.plan(100, 20, 4)
+	assert error.value.status == 422
+	assert error.value.details['maxIterations'] == 41
+	assert error.value.details['estimatedSeconds'] == pytest.approx(2.4)
+	assert controller.plan(100, 20, 4, allow_downgrade=True) == (41, pytest.approx(0.984))
+	assert controller.plan(100, 20, 4, allow_downgrade=True, covariance=True)[0] == 35
+
+	assert controller.plan_units(100, 10.0, fixed_units=500.0, allow_downgrade=True) == (50, pytest.approx(1.0))
+	with pytest.raises(admission.AdmissionError) as error:
+		controller.plan_units(100, 10.0, fixed_units=990.0, allow_downgrade=True)
+	assert error.value.status == 422 and error.value.details['maxIterations'] == 1
+
+
+def test_admission_admit(tmp_path):
+	"""
+	This test verifies the per-client limit (429), the in-flight budget (503
+	with a retry delay) and that slots are released when the block exits,
+	also on errors, both with a shared state file and in-process.
+
+	Returns
+	-------
+	None.
+
+	"""
+	for state_path in [str(tmp_path / 'state' / 'admission.json'), None]:
+		controller = admission.AdmissionController(
+			admission.CostModel(units_per_second=1000.0),
+			max_worker_seconds=1.0,
+			max_per_client=1,
+			state_path=state_path,
+		)
+		with controller.admit('a', 0.6):
+			with pytest.raises(admission.AdmissionError) as error:
+				with controller.admit('a', 0.1):
+					pass
+			assert error.value.status == 429
+
+			with pytest.raises(admission.AdmissionError) as error:
+				with controller.admit('b', 0.5):
+					pass
+			assert error.value.status == 503 and error.value.retry_after >= 1
+
+			with controller.admit('b', 0.3):
+				pass
+
+		with pytest.raises(RuntimeError):
+			with controller.admit('a', 0.6):
+				raise RuntimeError('simulation failed')
+		with controller.admit('a', 1.0):
+			pass
+		if state_path is not None:
+			assert json.loads(open(state_path, encoding='utf-8').read()) == {}
+
+
+def test_admission_drops_dead_processes(tmp_path):
+	"""
+	This test verifies that counters recorded by a process which has exited
+	are discarded instead of blocking its clients forever.
+
+	Returns
+	-------
+	None.
+
+	"""
+	child = subprocess.Popen([sys.executable, '-c', 'pass'])
+	child.wait()
+	state_path = tmp_path / 'admission.json'
+	state_path.write_text(json.dumps({str(child.pid): {'clients': {'a': 5}, 'seconds': 100.0}}), encoding='utf-8')
+
+	controller = admission.AdmissionController(
+		admission.CostModel(units_per_second=1000.0),
+		max_worker_seconds=1.0,
+		max_per_client=1,
+		state_path=str(state_path),
+	)
+	with controller.admit('a', 0.5):
+		assert list(json.loads(state_path.read_text(encoding='utf-8'))) == [str(os.getpid())]
+	assert json.loads(state_path.read_text(encoding='utf-8')) == {}
+
+
+def test_shared_cost_model(tmp_path):
+	"""
+	This test verifies that the calibration is stored once and reused, and
+	redone when it comes from another host.
+
+	Returns
+	-------
+	None.
+
+	"""
+	path = str(tmp_path / 'cost_model.json')
+	first = admission.shared_cost_model(path)
+	assert first.units_per_second > 0
+	assert admission.shared_cost_model(path) == first
+
+	record = json.loads(open(path, encoding='utf-8').read())
+	with open(path, 'w', encoding='utf-8') as stream:
+		json.dump(dict(record, host='elsewhere', units_per_second=1.0), stream)
+	assert admission.shared_cost_model(path).units_per_second != 1.0
+
+
+def test_compiled_scenario_hashable_and_frozen():
+	"""
+	This test verifies that compiled scenarios are immutable and hashable, and
+	that compiling equal data twice gives equal (cache-friendly) scenarios.
+
+	Returns
+	-------
+	None.
+
+	"""
+	first = Electoral_Montecarlo.compile_scenario(_scenario_data())
+	second = Electoral_Montecarlo.compile_scenario(_scenario_data())
+	assert first == second and hash(first) == hash(second)
+	assert {first: 'cached'}[second] == 'cached'
+	assert first != Electoral_Montecarlo.compile_scenario(_scenario_data(seats=100))
+	with pytest.raises(dataclasses.FrozenInstanceError):
+		first.majoritarian_seats = 0
+
+
+def test_run_scenario_leaves_scenario_untouched():
+	"""
+	This test verifies that run_scenario does not modify the compiled scenario
+	and only depends on the generator it is given.
+
+	Returns
+	-------
+	None.
+
+	"""
+	scenario = Electoral_Montecarlo.compile_scenario(_scenario_data())
+	snapshot = copy.deepcopy(scenario)
+	first = Electoral_Montecarlo.run_scenario(scenario, 200, rd.Random(9), keep_history=True, covariance=True, distributions=True)
+	assert scenario == snapshot
+	second = Electoral_Montecarlo.run_scenario(scenario, 200, rd.Random(9), keep_history=True)
+	assert first.totals == second.totals and first.history == second.history
+
+
+def test_rng_streams_reproducible_and_distinct():
+	"""
+	This test verifies that stream(i) is reproducible for a root seed, distinct
+	across indices, seeds and workers, and that local() gives every thread
+	its own generator.
+
+	Returns
+	-------
+	None.
+
+	"""
+	def first_draws(generator):
+		return [generator.random() for _ in range(3)]
+
+	streams = Electoral_Montecarlo.RngStreams(5)
+	assert first_draws(streams.stream(3)) == first_draws(Electoral_Montecarlo.RngStreams(5).stream(3))
+	assert first_draws(streams.stream(3)) != first_draws(streams.stream(4))
+	assert first_draws(streams.stream(3)) != first_draws(Electoral_Montecarlo.RngStreams(6).stream(3))
+	assert first_draws(streams.stream(3)) != first_draws(Electoral_Montecarlo.RngStreams(5, worker='2').stream(3))
+	assert Electoral_Montecarlo.RngStreams().root_seed != Electoral_Montecarlo.RngStreams().root_seed
+
+	generators = []
+	def collect():
+		generators.append(streams.local())
+		assert streams.local() is generators[-1]
+
+	threads = [threading.Thread(target=collect) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert len({id(generator) for generator in generators}) == 4
+	assert len({tuple(first_draws(generator)) for generator in generators}) == 4
+
+
+def _forked_draw(streams, queue):
+	"""
+	Report the first draw of the calling (forked) process's local stream.
+
+	Returns
+	-------
+	None.
+
+	"""
+	queue.put(streams.local().random())
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='requires fork')
+def test_rng_streams_independent_across_forks():
+	"""
+	This test verifies that processes forked after creating seeded RngStreams
+	do not replay the parent's streams or each other's.
+
+	Returns
+	-------
+	None.
+
+	"""
+	context = multiprocessing.get_context('fork')
+	streams = Electoral_Montecarlo.RngStreams(11)
+	queue = context.Queue()
+	children = [context.Process(target=_forked_draw, args=(streams, queue)) for _ in range(3)]
+	for child in children:
+		child.start()
+	draws = [queue.get(timeout=30) for _ in children]
+	for child in children:
+		child.join()
+	assert len(set(draws)) == 3
+	assert streams.stream(0).random() not in draws